@@ -5,10 +5,9 @@
 
 
 import pandas as pd
-import geopandas as gpd
+from cache import read_layer
+from reproject import reproject
 import matplotlib.pyplot as plt
-import folium
-from shapely.geometry import Point
 
 
 # File paths
@@ -17,9 +16,9 @@ admin_boundaries_path = r"\conflict_climate_health\00_Boundaries\SOM_Adminbnda_A
 conflict_data_path = r"\conflict_climate_health\ACLED\ACLED_Somalia_Fatalities.shp"
 
 # Load data
-health_gdf = gpd.read_file(health_facilities_path)
-admin_gdf = gpd.read_file(admin_boundaries_path)
-conflict_gdf = gpd.read_file(conflict_data_path)
+health_gdf = read_layer(health_facilities_path)
+admin_gdf = read_layer(admin_boundaries_path)
+conflict_gdf = read_layer(conflict_data_path)
 
 # Read the first 5 rows of the health facilities GeoDataFrame
 #print(health_gdf.head())
@@ -28,9 +27,9 @@ conflict_gdf = gpd.read_file(conflict_data_path)
 
 # Ensure consistent CRS
 target_crs = "EPSG:4326"  # WGS 84
-health_gdf = health_gdf.to_crs(target_crs)
-admin_gdf = admin_gdf.to_crs(target_crs)
-conflict_gdf = conflict_gdf.to_crs(target_crs)
+health_gdf = reproject(health_gdf, target_crs)
+admin_gdf = reproject(admin_gdf, target_crs)
+conflict_gdf = reproject(conflict_gdf, target_crs)
 
 # Plot conflicts and health facilities
 fig, ax = plt.subplots(figsize=(12, 8))
@@ -43,11 +42,14 @@ plt.show()
 
 #########################################################################################
 # Create a map of health facilities and conflict events per region
-import geopandas as gpd
+from cache import read_layer
+from reproject import reproject
 import pandas as pd
 import matplotlib.pyplot as plt
-import folium
-from shapely.geometry import Point
+from points import build_points, HEALTH_COORDS, ACLED_COORDS
+from regions import RegionIndex
+from aggregate import region_table
+from lod import figure_width_px, with_lod_geometry
 
 # ---- File Paths ----
 health_sites_path = r"\conflict_climate_health\who_health_sites\WHO_health_sites.shp"
@@ -55,40 +57,40 @@ admin_boundaries_path = r"\conflict_climate_health\00_Boundaries\SOM_Adminbnda_A
 conflict_data_path = r"\conflict_climate_health\ACLED\ACLED_Somalia_Fatalities.shp"
 
 # ---- Load Data ----
-health_gdf = gpd.read_file(health_sites_path)
-admin_gdf = gpd.read_file(admin_boundaries_path)
-conflict_gdf = gpd.read_file(conflict_data_path)
+health_gdf = read_layer(health_sites_path)
+admin_gdf = read_layer(admin_boundaries_path)
+conflict_gdf = read_layer(conflict_data_path)
 
 # Print column names for debugging
 print("Conflict Data Columns:", conflict_gdf.columns)
 
 # ---- Ensure CRS Consistency ----
 target_crs = "EPSG:4326"  # WGS 84
-health_gdf = health_gdf.to_crs(target_crs)
-admin_gdf = admin_gdf.to_crs(target_crs)
-conflict_gdf = conflict_gdf.to_crs(target_crs)
+health_gdf = reproject(health_gdf, target_crs)
+admin_gdf = reproject(admin_gdf, target_crs)
+conflict_gdf = reproject(conflict_gdf, target_crs)
 
 # ---- Convert to GeoDataFrames ----
 # Fix column references based on conflict dataset
-health_gdf["geometry"] = health_gdf.apply(lambda row: Point(float(row["Long"]), float(row["Lat"])), axis=1)
-conflict_gdf["geometry"] = conflict_gdf.apply(lambda row: Point(float(row["longitude"]), float(row["latitude"])), axis=1)
+# Points are built in one bulk call; rows with bad coordinates are dropped and reported
+health_gdf = build_points(health_gdf, *HEALTH_COORDS, crs=target_crs)
+conflict_gdf = build_points(conflict_gdf, *ACLED_COORDS, crs=target_crs)
 
-# ---- Spatial Join to Assign Regions ----
-health_gdf = gpd.sjoin(health_gdf, admin_gdf, how="left", predicate="within")
-conflict_gdf = gpd.sjoin(conflict_gdf, admin_gdf, how="left", predicate="within")
+# ---- Assign Regions (region index is built once for both layers) ----
+region_index = RegionIndex(admin_gdf, name_col="admin1Name")
+health_codes = region_index.assign(health_gdf)
+conflict_codes = region_index.assign(conflict_gdf)
+health_gdf["admin1Name"] = region_index.labels(health_codes)
+conflict_gdf["admin1Name"] = region_index.labels(conflict_codes)
 
-# ---- Aggregate Data per Region ----
-region_health_counts = health_gdf.groupby("admin1Name").size().reset_index(name="Health_Facilities")
-region_conflict_counts = conflict_gdf.groupby("admin1Name").size().reset_index(name="Conflicts")
+# ---- Aggregate Data per Region (one pass, no merges) ----
+admin_gdf = region_table(admin_gdf, {"Health_Facilities": health_codes, "Conflicts": conflict_codes})
 
-# ---- Merge Aggregated Data into Administrative Boundaries ----
-admin_gdf = admin_gdf.merge(region_health_counts, on="admin1Name", how="left").fillna(0)
-admin_gdf = admin_gdf.merge(region_conflict_counts, on="admin1Name", how="left").fillna(0)
-
-# ---- Static Map ----
+# ---- Static Map (boundaries simplified to the figure resolution) ----
 fig, ax = plt.subplots(figsize=(12, 8))
-admin_gdf.plot(column="Health_Facilities", cmap="Blues", edgecolor="black", linewidth=0.5, legend=True, ax=ax)
-admin_gdf.plot(column="Conflicts", cmap="Reds", edgecolor="black", linewidth=0.5, alpha=0.5, legend=True, ax=ax)
+map_gdf = with_lod_geometry(admin_gdf, admin_boundaries_path, figure_width_px((12, 8), dpi=fig.dpi))
+map_gdf.plot(column="Health_Facilities", cmap="Blues", edgecolor="black", linewidth=0.5, legend=True, ax=ax)
+map_gdf.plot(column="Conflicts", cmap="Reds", edgecolor="black", linewidth=0.5, alpha=0.5, legend=True, ax=ax)
 plt.title("Health Facilities & Conflict Events Per Region in Somalia")
 plt.show()
 
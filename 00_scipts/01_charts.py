@@ -1,30 +1,34 @@
 # We will generate a time-series (animated) map to visualize how conflicts evolve 
 # over time, while health facilities remain constant.
-import geopandas as gpd
+# Set GEOHEALTH_HEADLESS=1 to save the figures to 04_outputs/ instead of showing them.
+from cache import read_layer
 import pandas as pd
+from render import show
 import matplotlib.pyplot as plt
 import seaborn as sns
+from event_cube import cached_cube
+from stats import regression
 
 # ---- File Paths ----
 health_sites_path = r"\conflict_climate_health\who_health_sites\WHO_health_sites.shp"
 conflict_data_path = r"\conflict_climate_health\ACLED\ACLED_Somalia_Fatalities.shp"
 
 # ---- Load Data ----
-health_gdf = gpd.read_file(health_sites_path)
-conflict_gdf = gpd.read_file(conflict_data_path)
+# Only the attribute fields used below are loaded (no geometry)
+health_gdf = read_layer(health_sites_path, columns=["Admin1"], geometry=False)
+conflict_gdf = read_layer(conflict_data_path, columns=["fatalities"], geometry=False)
 
-# ---- Convert Dates for Time-Series Analysis ----
-conflict_gdf["event_date"] = pd.to_datetime(conflict_gdf["event_date"], errors="coerce")
-conflict_gdf["year"] = conflict_gdf["event_date"].dt.year  # Extract year
+# ---- Event Cube (region x month x event type, binned once and cached) ----
+conflict_cube = cached_cube(conflict_data_path, region_col="admin1")
 
 # ---- Conflict Trends Over Time ----
 plt.figure(figsize=(12, 6))
-sns.lineplot(data=conflict_gdf.groupby("year").size().reset_index(name="conflicts"), x="year", y="conflicts", marker="o", color="red")
+sns.lineplot(data=conflict_cube.yearly(label="year").rename(columns={"Count": "conflicts"}), x="year", y="conflicts", marker="o", color="red")
 plt.title("Conflict Trends in Somalia (Yearly)", fontsize=14)
 plt.xlabel("Year", fontsize=12)
 plt.ylabel("Number of Conflicts", fontsize=12)
 plt.grid(True)
-plt.show()
+show(plt.gcf(), "01_conflict_trends")
 
 # ---- Fatalities Distribution ----
 plt.figure(figsize=(12, 6))
@@ -33,17 +37,17 @@ plt.title("Distribution of Fatalities in Conflicts", fontsize=14)
 plt.xlabel("Fatalities per Conflict", fontsize=12)
 plt.ylabel("Frequency", fontsize=12)
 plt.grid(True)
-plt.show()
+show(plt.gcf(), "01_fatalities_distribution")
 
 # ---- Conflict Hotspots by Region ----
 plt.figure(figsize=(12, 6))
-region_conflicts = conflict_gdf.groupby("admin1").size().reset_index(name="conflicts")
+region_conflicts = conflict_cube.per_region().rename_axis("admin1").reset_index(name="conflicts")
 sns.barplot(data=region_conflicts.sort_values("conflicts", ascending=False), x="conflicts", y="admin1", palette="coolwarm")
 plt.title("Top Conflict Hotspots by Region", fontsize=14)
 plt.xlabel("Number of Conflicts", fontsize=12)
 plt.ylabel("Region", fontsize=12)
 plt.grid(axis="x")
-plt.show()
+show(plt.gcf(), "01_conflict_hotspots")
 
 # ---- Health Facilities vs. Conflicts Per Region ----
 health_counts = health_gdf.groupby("Admin1").size().reset_index(name="Health_Facilities")
@@ -52,10 +56,11 @@ merged_df = pd.merge(region_conflicts, health_counts, left_on="admin1", right_on
 plt.figure(figsize=(10, 6))
 sns.regplot(data=merged_df, x="Health_Facilities", y="conflicts", scatter_kws={"s": 50, "color": "blue"}, line_kws={"color": "red"})
 plt.title("Health Facilities vs. Conflict Events", fontsize=14)
+print(regression(merged_df["Health_Facilities"], merged_df["conflicts"]))  # slope and R² with 95% bootstrap intervals
 plt.xlabel("Number of Health Facilities", fontsize=12)
 plt.ylabel("Number of Conflicts", fontsize=12)
 plt.grid(True)
-plt.show()
+show(plt.gcf(), "01_health_vs_conflicts")
 
 
 ##########################################################################################
@@ -64,15 +69,14 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import geopandas as gpd
+from event_cube import cached_cube
 
-# ---- Load Conflict Data ----
+# ---- Load Conflict Data (per-region counts are a slice of the cached event cube) ----
 conflict_data_path = r"\conflict_climate_health\ACLED\ACLED_Somalia_Fatalities.shp"
-conflict_gdf = gpd.read_file(conflict_data_path)
+conflict_cube = cached_cube(conflict_data_path, region_col="admin1")
 
 # ---- Aggregate Conflict Counts Per Region ----
-conflict_counts = conflict_gdf.groupby("admin1").size().reset_index(name="conflicts")
-conflict_counts = conflict_counts.sort_values("conflicts", ascending=False)  # Sort for better visualization
+conflict_counts = conflict_cube.per_region().rename_axis("admin1").reset_index(name="conflicts")  # Sorted, largest first
 
 # ---- Convert Data for Polar Plot ----
 regions = conflict_counts["admin1"].tolist()
@@ -95,4 +99,4 @@ ax.set_xticklabels(regions, fontsize=12, fontweight="bold", rotation=30, ha="rig
 ax.set_yticklabels(["0", "10", "20", "30", "40", "50", "60"], fontsize=10)
 
 plt.title("Conflict Events per Region in Somalia", fontsize=14, fontweight="bold")
-plt.show()
+show(fig, "01_conflicts_polar")
@@ -1,56 +1,74 @@
-# In this script, we will merge the ACLED different columns into the Somalia Admin Boundaries shapefile.
+# In this script, we will merge the ACLED events, fatalities and WHO health facility counts into the Somalia Admin Boundaries shapefile.
 
-import geopandas as gpd
+from cache import read_layer
+from reproject import reproject
 import pandas as pd
+from regions import RegionIndex
+from aggregate import region_table
+from streaming import stream_region_table
+from incremental import EventLedger, ledger_region_table, update
 
 # Define file paths
 acled_shp = r"\conflict_climate_health\conflict_data\ACLED_original_data\ACLED_Somalia_Fatalities.shp"
+acled_new_events_shp = r"\conflict_climate_health\conflict_data\ACLED_original_data\ACLED_Somalia_new_events.shp"
+health_facilities_shp = r"\conflict_climate_health\who_health_sites\WHO_health_sites.shp"
 somalia_admin_shp = r"\conflict_climate_health\conflict_data\total_fatalities\00_conflict_total_fatalities.shp"
 output_shp = r"\conflict_climate_health\conflict_data\total_fatalities\Somalia_Regions_with_Events.shp"
+output_health_shp = r"\conflict_climate_health\conflict_data\total_fatalities\Somalia_Regions_with_Health_Events.shp"
 
-# Load the ACLED conflict data (point data)
-acled_gdf = gpd.read_file(acled_shp)
+# Set to a row count (e.g. 100_000) to read large or multi-country ACLED exports in chunks
+stream_chunksize = None
+# Set to True to join only the new or revised ACLED events (acled_new_events_shp) and add them to the totals kept
+# by incremental.py
+incremental_mode = False
 
-# Load the Somalia administrative boundaries (polygon data)
-somalia_admin_gdf = gpd.read_file(somalia_admin_shp)
-
-# Ensure both GeoDataFrames have the same CRS (Coordinate Reference System)
-if acled_gdf.crs != somalia_admin_gdf.crs:
-    acled_gdf = acled_gdf.to_crs(somalia_admin_gdf.crs)
-
-# Read the ACLED data columns
-print("ACLED Columns:", acled_gdf.columns)
+# Load the health facilities (point data) and the Somalia administrative boundaries (polygon data)
+health_gdf = read_layer(health_facilities_shp, columns=[])  # only the points are needed
+somalia_admin_gdf = read_layer(somalia_admin_shp)
+health_gdf = reproject(health_gdf, somalia_admin_gdf.crs)
 
 # Read the Somalia Admin Boundaries columns
 print("Somalia Admin Columns:", somalia_admin_gdf.columns)
 
-# Perform a spatial join to link conflict events with administrative regions
-acled_joined = gpd.sjoin(acled_gdf, somalia_admin_gdf, how="left", predicate="within")
-print("Columns in acled_joined after spatial join:", acled_joined.columns)
-
-# Rename columns for clarity
-acled_joined = acled_joined.rename(columns={"admin1_left": "admin1"})  # Use ACLED's admin1
-somalia_admin_gdf = somalia_admin_gdf.rename(columns={"admin1_right": "admin1"})  # Use Somalia Regions' admin1
-
-# Ensure "admin1" exists before grouping
-print("Unique values in acled_joined['admin1']:", acled_joined["admin1"].unique())
-
-# Count the number of conflict events per "admin1" region
-events_per_admin = acled_joined.groupby("admin1").size().reset_index(name="event_count")
-
-# Merge the event count with Somalia admin boundaries
-somalia_admin_gdf = somalia_admin_gdf.merge(events_per_admin, on="admin1", how="left")
-
-# Fill missing values (regions with no events) with 0
-somalia_admin_gdf["event_count"] = somalia_admin_gdf["event_count"].fillna(0)
+if incremental_mode:
+    # The first run builds the ledger from the full history, later runs fold in only the new export
+    # (retroactive edits are applied as deltas)
+    if EventLedger.load() is None:
+        update(acled_shp, somalia_admin_shp)
+    ledger = update(acled_new_events_shp, somalia_admin_shp)
+    health_codes = RegionIndex(somalia_admin_gdf, name_col="admin1").assign(health_gdf)
+    region_gdf = ledger_region_table(ledger, somalia_admin_gdf, health_codes)
+elif stream_chunksize:
+    # Assign and count the ACLED events chunk by chunk (same table as below)
+    region_gdf, _ = stream_region_table(acled_shp, somalia_admin_gdf, health_gdf, chunksize=stream_chunksize)
+else:
+    # Load the ACLED conflict data (point data) in the same CRS as the regions
+    acled_gdf = read_layer(acled_shp, columns=["fatalities"])
+    acled_gdf = reproject(acled_gdf, somalia_admin_gdf.crs)
+
+    # Read the ACLED data columns
+    print("ACLED Columns:", acled_gdf.columns)
+
+    # Link conflict events and health facilities with administrative regions (integer region codes)
+    region_index = RegionIndex(somalia_admin_gdf, name_col="admin1")
+    acled_codes = region_index.assign(acled_gdf)
+    health_codes = region_index.assign(health_gdf)
+
+    # Count events and facilities (and sum fatalities) per "admin1" region in one pass
+    layers = {"event_count": acled_codes, "health_facilities": health_codes}
+    if "fatalities" in acled_gdf.columns:
+        layers["fatalities"] = (acled_codes, acled_gdf["fatalities"])
+
+    region_gdf = region_table(somalia_admin_gdf, layers)
 
 # Keep only required columns
-somalia_admin_gdf = somalia_admin_gdf[["OBJECTID_1", "admin1Name", "admin1Pcod", "admin1", "fatalities", "event_count", "geometry"]]
+region_gdf = region_gdf[["OBJECTID_1", "admin1Name", "admin1Pcod", "admin1", "fatalities", "event_count", "health_facilities", "geometry"]]
 
 # Print column names for debugging
-print("Columns in somalia_admin_gdf after merge:", somalia_admin_gdf.columns)
+print("Columns in region_gdf:", region_gdf.columns)
 
-# Save the result as a new shapefile
-somalia_admin_gdf.to_file(output_shp)
+# Save the results as new shapefiles (with and without the health facility counts)
+region_gdf.drop(columns="health_facilities").to_file(output_shp)
+region_gdf.to_file(output_health_shp)
 
-print(f"Processed shapefile saved at: {output_shp}")
\ No newline at end of file
+print(f"Processed shapefiles saved at: {output_shp}, {output_health_shp}")
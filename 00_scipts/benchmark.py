@@ -0,0 +1,320 @@
+# Scaling benchmark of the pipeline stages on synthetic data.
+#
+# Health sites and conflict events are drawn uniformly inside the real Somali
+# region polygons at multiples of the size of the source layers (716 WHO
+# sites, ~18k ACLED events), and every stage the scripts perform is timed at
+# each scale: read_file/to_file round trips, to_crs, point construction,
+# the region join, the per-region counts and figure rendering. The original
+# row-wise paths (apply(Point), gpd.sjoin, groupby/merge/fillna) are timed
+# next to their replacements (points.build_points, regions.RegionIndex,
+# aggregate.region_table). Stages that only scale row by row or write
+# shapefiles are skipped above --limit rows and recorded as skipped.
+#
+# Results are written as JSON (one record per scale and stage, plus the
+# package versions and git commit) to 04_outputs/benchmarks/, so runs can be
+# compared across changes:
+#
+#   python benchmark.py [--scales 10 100 1000] [--limit 2000000] [--out FILE.json]
+#   python benchmark.py --compare OLD.json NEW.json
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from contextlib import contextmanager
+
+import matplotlib
+matplotlib.use("Agg")
+
+import numpy as np  # noqa: E402  (backend must be chosen first)
+import pandas as pd  # noqa: E402
+import geopandas as gpd  # noqa: E402
+import matplotlib.pyplot as plt  # noqa: E402
+from shapely.geometry import Point  # noqa: E402
+
+import charts  # noqa: E402
+from accessibility import METRIC_CRS  # noqa: E402
+from aggregate import region_table  # noqa: E402
+from points import ACLED_COORDS, HEALTH_COORDS, build_points  # noqa: E402
+from regions import OUTSIDE, RegionIndex  # noqa: E402
+from render import OUTPUT_DIR, save  # noqa: E402
+
+
+# Shapefiles have no datetime field type; the dates are written as text, as in the ACLED export
+warnings.filterwarnings("ignore", message="Field .* created as String field")
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REGIONS_SHP = os.path.join(os.path.dirname(SCRIPTS_DIR), "01_data", "total_fatalities",
+                           "00_conflict_total_fatalities.shp")
+BENCH_DIR = os.path.join(OUTPUT_DIR, "benchmarks")
+
+BASE_HEALTH = 716     # WHO_health_sites.shp
+BASE_EVENTS = 18_416  # ACLED_Somalia_Fatalities.shp
+SCALES = (10, 100, 1000)
+ROW_LIMIT = 2_000_000  # row-wise and shapefile stages are skipped above this
+EVENT_TYPES = ["Battles", "Explosions/Remote violence", "Violence against civilians", "Riots", "Protests",
+               "Strategic developments"]
+
+
+# ---- Synthetic layers ----
+def sample_in_regions(index, n, rng, batch=1_000_000):
+    """``n`` uniform (x, y) points inside the regions of ``index`` and their region codes."""
+    xs, ys, codes, found = [], [], [], 0
+    maxx = index.minx + index.nx * index.dx
+    maxy = index.miny + index.ny * index.dy
+    while found < n:
+        x = rng.uniform(index.minx, maxx, batch)
+        y = rng.uniform(index.miny, maxy, batch)
+        code = index.assign_xy(x, y)
+        keep = code != OUTSIDE
+        xs.append(x[keep])
+        ys.append(y[keep])
+        codes.append(code[keep])
+        found += int(keep.sum())
+    return np.concatenate(xs)[:n], np.concatenate(ys)[:n], np.concatenate(codes)[:n]
+
+
+def synthetic_events(index, n, rng):
+    """ACLED-like event table (lat/long columns, no geometry) inside the regions."""
+    x, y, codes = sample_in_regions(index, n, rng)
+    days = rng.integers(0, 365 * 28, n)
+    dates = np.datetime64("1997-01-01") + days.astype("timedelta64[D]")
+    return pd.DataFrame({
+        "event_date": dates,
+        "year": dates.astype("datetime64[Y]").astype(int) + 1970,
+        "event_type": pd.Categorical.from_codes(rng.integers(0, len(EVENT_TYPES), n), EVENT_TYPES),
+        "admin1": index.names[codes],
+        "fatalities": rng.poisson(0.8, n) * rng.integers(0, 3, n),
+        ACLED_COORDS[1]: y,
+        ACLED_COORDS[0]: x,
+    })
+
+
+def synthetic_health(index, n, rng):
+    """WHO-like facility table (Lat/Long columns, no geometry) inside the regions."""
+    x, y, codes = sample_in_regions(index, n, rng)
+    return pd.DataFrame({
+        "fid": np.arange(1, n + 1),
+        "Admin1": index.names[codes],
+        "facility_t": pd.Categorical.from_codes(rng.integers(0, 3, n), ["Health Post", "Health Centre", "Hospital"]),
+        HEALTH_COORDS[1]: y,
+        HEALTH_COORDS[0]: x,
+    })
+
+
+# ---- Legacy stages (as the scripts did it before the shared modules) ----
+def legacy_points(df, x_col, y_col, crs):
+    geometry = df.apply(lambda row: Point(row[x_col], row[y_col]), axis=1)
+    return gpd.GeoDataFrame(df, geometry=geometry, crs=crs)
+
+
+def legacy_counts(admin_gdf, events_gdf, health_gdf):
+    events = gpd.sjoin(events_gdf, admin_gdf[["admin1", "geometry"]], how="left", predicate="within")
+    health = gpd.sjoin(health_gdf, admin_gdf[["admin1", "geometry"]], how="left", predicate="within")
+    return events, health
+
+
+def legacy_table(admin_gdf, events, health):
+    per_region = events.groupby("admin1_right").agg(event_count=("fatalities", "size"),
+                                                    fatalities=("fatalities", "sum"))
+    facilities = health.groupby("admin1").size().rename("health_fac")
+    table = admin_gdf[["admin1", "geometry"]].merge(per_region, left_on="admin1", right_index=True, how="left")
+    table = table.merge(facilities, left_on="admin1", right_index=True, how="left")
+    return table.fillna({"event_count": 0, "fatalities": 0, "health_fac": 0})
+
+
+# ---- Timing ----
+class Recorder:
+    """Collects one record per (scale, stage)."""
+
+    def __init__(self, limit=ROW_LIMIT):
+        self.limit = limit
+        self.results = []
+
+    @contextmanager
+    def stage(self, scale, name, rows):
+        record = {"scale": scale, "stage": name, "rows": int(rows)}
+        start = time.perf_counter()
+        yield record
+        record["seconds"] = round(time.perf_counter() - start, 4)
+        if record["seconds"] > 0:
+            record["rows_per_s"] = round(rows / record["seconds"])
+        self.results.append(record)
+        print(f"  x{scale:<5d} {name:<22s} {rows:>11,d} rows {record['seconds']:9.3f} s")
+
+    def skip(self, scale, name, rows, reason=None):
+        self.results.append({"scale": scale, "stage": name, "rows": int(rows),
+                             "skipped": reason or f"more than {self.limit:,d} rows"})
+        print(f"  x{scale:<5d} {name:<22s} {rows:>11,d} rows skipped")
+
+    def within_limit(self, rows):
+        return self.limit is None or rows <= self.limit
+
+
+def run_scale(admin_gdf, index, scale, recorder, rng, tmp_dir):
+    n_events, n_health = BASE_EVENTS * scale, BASE_HEALTH * scale
+    rec = recorder
+
+    with rec.stage(scale, "synthesize", n_events + n_health):
+        events_df = synthetic_events(index, n_events, rng)
+        health_df = synthetic_health(index, n_health, rng)
+
+    # ---- Point construction ----
+    if rec.within_limit(n_events):
+        with rec.stage(scale, "points_apply", n_events):
+            legacy_points(events_df, *ACLED_COORDS, admin_gdf.crs)
+    else:
+        rec.skip(scale, "points_apply", n_events)
+    with rec.stage(scale, "points_build", n_events):
+        events = build_points(events_df, *ACLED_COORDS, crs=admin_gdf.crs, verbose=False)
+    health = build_points(health_df, *HEALTH_COORDS, crs=admin_gdf.crs, verbose=False)
+    del events_df, health_df
+
+    # ---- Shapefile round trip ----
+    shp = os.path.join(tmp_dir, f"events_x{scale}.shp")
+    if rec.within_limit(n_events):
+        with rec.stage(scale, "to_file", n_events):
+            events.to_file(shp)
+        with rec.stage(scale, "read_file", n_events):
+            gpd.read_file(shp)
+    else:
+        rec.skip(scale, "to_file", n_events)
+        rec.skip(scale, "read_file", n_events)
+
+    with rec.stage(scale, "to_crs", n_events):
+        events.to_crs(METRIC_CRS)
+
+    # ---- Region join and counts ----
+    if rec.within_limit(n_events):
+        with rec.stage(scale, "sjoin", n_events + n_health):
+            joined_events, joined_health = legacy_counts(admin_gdf, events, health)
+        with rec.stage(scale, "groupby_merge", n_events + n_health):
+            legacy_table(admin_gdf, joined_events, joined_health)
+        del joined_events, joined_health
+    else:
+        rec.skip(scale, "sjoin", n_events + n_health)
+        rec.skip(scale, "groupby_merge", n_events + n_health)
+
+    with rec.stage(scale, "region_assign", n_events + n_health):
+        event_codes = index.assign(events)
+        health_codes = index.assign(health)
+    with rec.stage(scale, "region_table", n_events + n_health):
+        table = region_table(admin_gdf, {"event_coun": event_codes, "fatalities": (event_codes, events["fatalities"]),
+                                         "health_fac": health_codes}, ["admin1", "geometry"])
+
+    # ---- Figures ----
+    with rec.stage(scale, "render_choropleth", len(table)):
+        save(charts.health_facilities_choropleth(table), f"choropleth_x{scale}", tmp_dir)
+    if rec.within_limit(n_events):
+        with rec.stage(scale, "render_points", n_events + n_health):
+            fig, ax = plt.subplots(figsize=(12, 8))
+            admin_gdf.plot(ax=ax, color="lightgrey", edgecolor="black")
+            health.plot(ax=ax, color="blue", markersize=5)
+            events.plot(ax=ax, color="red", markersize=1)
+            save(fig, f"points_x{scale}", tmp_dir)
+    else:
+        rec.skip(scale, "render_points", n_events + n_health)
+
+
+def environment():
+    """Package versions, machine and git commit of this run."""
+    import pyproj
+    import shapely
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "packages": {"numpy": np.__version__, "pandas": pd.__version__, "geopandas": gpd.__version__,
+                     "shapely": shapely.__version__, "pyproj": pyproj.__version__,
+                     "matplotlib": matplotlib.__version__},
+    }
+
+
+def run_benchmark(scales=SCALES, regions_path=REGIONS_SHP, limit=ROW_LIMIT, seed=0):
+    """Time every stage at each scale; returns the JSON-ready report."""
+    # The source layers are in EPSG:4326; the region layer's 3-D geographic CRS cannot be written to shapefiles
+    admin_gdf = gpd.read_file(regions_path).to_crs("EPSG:4326")
+    recorder = Recorder(limit)
+    rng = np.random.default_rng(seed)
+
+    with recorder.stage(0, "region_index", len(admin_gdf)):
+        index = RegionIndex(admin_gdf)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in scales:
+            print(f"Scale x{scale}: {BASE_EVENTS * scale:,d} events, {BASE_HEALTH * scale:,d} health sites")
+            run_scale(admin_gdf, index, scale, recorder, rng, tmp_dir)
+
+    return {**environment(), "regions": os.path.abspath(regions_path), "seed": seed, "row_limit": limit,
+            "base": {"events": BASE_EVENTS, "health_sites": BASE_HEALTH}, "results": recorder.results}
+
+
+# ---- Reports ----
+def results_table(report):
+    """Seconds per stage (rows) and scale (columns)."""
+    df = pd.DataFrame(report["results"])
+    if "seconds" not in df.columns:
+        df["seconds"] = np.nan
+    return df.pivot_table(index="stage", columns="scale", values="seconds", aggfunc="first", sort=False)
+
+
+def compare(old, new, threshold=1.2):
+    """Ratio new/old of every timed stage; ratios above ``threshold`` are flagged."""
+    ratio = results_table(new) / results_table(old)
+    ratio = ratio.dropna(how="all").dropna(axis=1, how="all")
+    flagged = ratio.stack()[lambda s: s > threshold]
+    return ratio, flagged
+
+
+def write_report(report, path=None):
+    if path is None:
+        stamp = report["created"].replace(":", "").replace("-", "")
+        path = os.path.join(BENCH_DIR, f"benchmark_{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=1)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the pipeline stages on synthetic data at several scales.")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES),
+                        help=f"multiples of {BASE_EVENTS} events / {BASE_HEALTH} health sites")
+    parser.add_argument("--regions", default=REGIONS_SHP)
+    parser.add_argument("--limit", type=int, default=ROW_LIMIT,
+                        help="skip row-wise and shapefile stages above this many rows (0: never skip)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="JSON file (default: 04_outputs/benchmarks/benchmark_<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    pd.set_option("display.width", 160)
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path) as fh:
+                reports.append(json.load(fh))
+        ratio, flagged = compare(*reports)
+        print("Seconds new / old:")
+        print(ratio.round(2))
+        if len(flagged):
+            print("Slower by more than 20%:")
+            print(flagged.round(2).to_string())
+        sys.exit(1 if len(flagged) else 0)
+
+    report = run_benchmark(args.scales, args.regions, args.limit or None, args.seed)
+    print(results_table(report).round(3))
+    print(f"Results saved to {write_report(report, args.out)}")
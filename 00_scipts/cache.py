@@ -0,0 +1,260 @@
+# Loader layer with a persistent on-disk cache of parsed shapefiles (and of
+# parsed tabular exports such as EM-DAT, see read_table).
+#
+# Each shapefile is parsed once with gpd.read_file and stored as an
+# uncompressed Arrow (Feather) file under 01_data/.cache/. Later loads
+# memory-map that file instead of decoding the .shp/.dbf again. Entries are
+# keyed by a content hash of the .shp/.dbf/.shx set; the hash is only
+# recomputed when the size or mtime of one of those files changes, and the
+# old entry is dropped when the content differs.
+#
+# read_layer(path, columns=[...], geometry=False) loads only the listed
+# attribute fields (and no geometry): Arrow columns that are not requested are
+# never read from the memory-mapped file, and without pyarrow the projection
+# is passed down to gpd.read_file so unused DBF fields are not decoded.
+
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+
+from instrument import span
+from lazy import lazy_import
+
+# geopandas is loaded on the first layer read; table-only callers (emdat.py) never need it
+gpd = lazy_import("geopandas")
+HAS_ARROW = importlib.util.find_spec("pyarrow") is not None  # needed by to_feather/read_feather
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "01_data", ".cache")
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "04_outputs")
+SOURCE_EXTS = (".shp", ".dbf", ".shx")
+MANIFEST = "manifest.json"
+
+
+# ---- Source fingerprints ----
+def source_files(path):
+    """Files that define ``path``: the .shp/.dbf/.shx set of a shapefile, otherwise the file itself."""
+    stem, ext = os.path.splitext(os.path.abspath(path))
+    if ext.lower() != ".shp":
+        return [stem + ext] if os.path.exists(stem + ext) else []
+    return [stem + ext for ext in SOURCE_EXTS if os.path.exists(stem + ext)]
+
+
+def source_stat(files):
+    return [[os.path.basename(f), os.path.getsize(f), os.stat(f).st_mtime_ns] for f in files]
+
+
+def content_hash(files):
+    """SHA-1 over the contents of ``files`` (in order)."""
+    h = hashlib.sha1()
+    for f in files:
+        h.update(os.path.basename(f).encode())
+        with open(f, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+# ---- Manifest: source path -> stat, content hash and cache file ----
+def _load_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(cache_dir, name, write):
+    """Write ``name`` via ``write(path)`` to a temporary file of its own, then move it in place."""
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=name + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, os.path.join(cache_dir, name))
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _save_entry(cache_dir, key, entry):
+    """Store ``entry`` under ``key``, merged into the manifest as it is now (other processes may have
+    added entries since it was read)."""
+    def write(tmp):
+        manifest = _load_manifest(cache_dir)
+        manifest[key] = entry
+        with open(tmp, "w") as fh:
+            json.dump(manifest, fh, indent=1)
+    _write_atomic(cache_dir, MANIFEST, write)
+
+
+def _drop(cache_dir, entry):
+    if entry:
+        try:
+            os.remove(os.path.join(cache_dir, entry["file"]))
+        except OSError:
+            pass
+
+
+# ---- Public loaders ----
+def _load_cached(path, parse, load, tag, cache_dir, verbose, caller, project=None):
+    """Return ``load(cache file)`` for ``path``, writing it from ``parse(path)`` when missing or stale.
+
+    ``project`` is the loader of a column subset: it replaces ``load`` and is
+    also applied to the freshly written entry, so cold and warm loads agree.
+    """
+    start = time.perf_counter()
+    files = source_files(path)
+    if not files:
+        raise FileNotFoundError(path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = _load_manifest(cache_dir)
+    source = os.path.splitext(os.path.abspath(path))[0]
+    key = f"{source}#{tag}" if tag else source
+    entry = manifest.get(key)
+    stat = source_stat(files)
+
+    cached = entry is not None and os.path.exists(os.path.join(cache_dir, entry["file"]))
+    if cached and entry["stat"] != stat:
+        # Touched files: only a content change invalidates the entry
+        digest = content_hash(files)
+        if digest == entry["hash"]:
+            entry["stat"] = stat
+            _save_entry(cache_dir, key, entry)
+        else:
+            cached = False
+
+    if cached:
+        frame = (project or load)(os.path.join(cache_dir, entry["file"]), memory_map=True)
+        kind = "warm"
+    else:
+        digest = content_hash(files)
+        frame = parse(path)
+        stem = f"{os.path.basename(source)}-{tag}" if tag else os.path.basename(source)
+        name = f"{stem}-{digest[:16]}.arrow"
+        _write_atomic(cache_dir, name, lambda tmp: frame.to_feather(tmp, compression="uncompressed"))
+        if entry and entry["file"] != name:
+            _drop(cache_dir, entry)
+        _save_entry(cache_dir, key, {"stat": stat, "hash": digest, "file": name})
+        if project is not None:
+            frame = project(os.path.join(cache_dir, name), memory_map=True)
+        kind = "cold"
+
+    if verbose:
+        print(f"{caller}: {kind} load of {os.path.basename(path)} in {time.perf_counter() - start:.3f} s")
+    return frame
+
+
+def _projection(columns, geometry):
+    """Loader of the cached layer that reads only ``columns`` (plus the geometry when ``geometry``).
+
+    Requested fields the layer does not have are skipped, as gpd.read_file
+    does, so callers keep their ``in df.columns`` fallbacks.
+    """
+    if columns is None and geometry:
+        return None
+
+    def load(file, memory_map=True):
+        from pyarrow import feather
+        table = feather.read_table(file, memory_map=memory_map)
+        names = [c for c in table.column_names if c != "geometry"]
+        if columns is not None:
+            names = [c for c in columns if c in names]
+        if geometry:
+            return gpd.read_feather(file, columns=names + ["geometry"], memory_map=memory_map)
+        return table.select(names).to_pandas()
+    return load
+
+
+def read_layer(path, cache_dir=CACHE_DIR, verbose=False, columns=None, geometry=True):
+    """Read a shapefile through the on-disk cache and return a GeoDataFrame.
+
+    ``columns`` limits the attribute fields that are loaded; with
+    ``geometry=False`` the geometry is skipped too and a DataFrame is returned.
+    """
+    with span("read_layer", layer=os.path.basename(path)) as s:
+        if not HAS_ARROW:
+            if columns is None and geometry:
+                gdf = gpd.read_file(path)
+            else:
+                gdf = gpd.read_file(path, columns=columns, ignore_geometry=not geometry)
+        else:
+            gdf = _load_cached(path, gpd.read_file, gpd.read_feather, None, cache_dir, verbose, "read_layer",
+                               _projection(columns, geometry))
+        s.rows_out = len(gdf)
+    return gdf
+
+
+def read_derived_layer(path, derive, tag, cache_dir=CACHE_DIR, verbose=False):
+    """GeoDataFrame computed from the layer at ``path`` by ``derive(path)``, cached like read_layer under ``tag``."""
+    if not HAS_ARROW:
+        return derive(path)
+    return _load_cached(path, derive, gpd.read_feather, tag, cache_dir, verbose, "read_derived_layer")
+
+
+def read_table(path, parse, tag, cache_dir=CACHE_DIR, verbose=False):
+    """Read a tabular file (e.g. a CSV export) with ``parse`` through the on-disk cache.
+
+    ``tag`` names the parsed form; change it when ``parse`` changes so that
+    entries written by the old parser are not reused.
+    """
+    if not HAS_ARROW:
+        return parse(path)
+    from pyarrow import feather
+    return _load_cached(path, parse, feather.read_feather, tag, cache_dir, verbose, "read_table")
+
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """Remove every cached layer and the manifest."""
+    manifest = _load_manifest(cache_dir)
+    for entry in manifest.values():
+        _drop(cache_dir, entry)
+    try:
+        os.remove(os.path.join(cache_dir, MANIFEST))
+    except OSError:
+        pass
+
+
+# ---- Cold vs. warm load timings ----
+DATA_DIR = os.path.dirname(CACHE_DIR)
+DEFAULT_LAYERS = [
+    os.path.join(DATA_DIR, "who_health_sites", "WHO_health_sites.shp"),
+    os.path.join(DATA_DIR, "total_fatalities", "ACLED_Somalia_Fatalities.shp"),
+    os.path.join(DATA_DIR, "total_fatalities", "00_conflict_total_fatalities.shp"),
+    os.path.join(DATA_DIR, "total_fatalities", "Somalia_Regions_with_Events.shp"),
+    os.path.join(DATA_DIR, "total_fatalities", "Somalia_Regions_with_Health_Events.shp"),
+]
+
+
+def report_timings(paths=DEFAULT_LAYERS, repeat=3):
+    """Print uncached, cold (parse + write) and warm (memory-mapped) load times."""
+    print(f"{'layer':45s} {'read_file':>10s} {'cold':>10s} {'warm':>10s}")
+    for path in paths:
+        start = time.perf_counter()
+        gpd.read_file(path)
+        plain = time.perf_counter() - start
+
+        manifest = _load_manifest(CACHE_DIR)
+        _drop(CACHE_DIR, manifest.get(os.path.splitext(os.path.abspath(path))[0]))
+
+        start = time.perf_counter()
+        read_layer(path)
+        cold = time.perf_counter() - start
+
+        warm = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            read_layer(path)
+            warm = min(warm, time.perf_counter() - start)
+        print(f"{os.path.basename(path):45s} {plain:10.4f} {cold:10.4f} {warm:10.4f}")
+
+
+if __name__ == "__main__":
+    report_timings(sys.argv[1:] or DEFAULT_LAYERS)
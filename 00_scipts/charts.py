@@ -0,0 +1,383 @@
+# Figure builders for the chart scripts (03_, 04_ and 05_).
+#
+# Every function takes the (already loaded) data, draws one figure and
+# returns it without showing it, so the same figure can be displayed
+# interactively or written to 04_outputs/ by render.py. seaborn, plotly and
+# wordcloud are imported on first use (lazy.py), so importing this module
+# only loads matplotlib.
+
+from math import pi
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from lazy import lazy_import
+
+sns = lazy_import("seaborn")
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
+wordcloud = lazy_import("wordcloud")
+
+
+# ---- Data preparation shared by several charts ----
+def year_counts(values, label="Year"):
+    """Counts per year as a (label, Count) DataFrame sorted by year."""
+    counts = values.value_counts().sort_index()
+    return pd.DataFrame({label: counts.index, "Count": counts.values})
+
+
+def emdat_years(df_emdat):
+    """Year of every EM-DAT record (first 4 characters of 'DisNo.', precomputed by emdat.load_emdat)."""
+    if "Year" in df_emdat.columns:
+        return df_emdat["Year"]
+    from emdat import disaster_years
+    return pd.Series(disaster_years(df_emdat["DisNo."]), index=df_emdat.index, name="Year")
+
+
+def disaster_codes(df_emdat):
+    """Integer codes of every record's disaster type and year, with their labels.
+
+    Types are hashed once into a categorical (codes are reused if the column
+    already is one); years are offsets from the first year, so both passes
+    are linear in the number of records.
+    """
+    types = pd.Categorical(df_emdat["Disaster Type"])
+    years = np.asarray(emdat_years(df_emdat), dtype=np.int64)
+    first, last = (int(years.min()), int(years.max())) if len(years) else (0, -1)
+    return types.codes, years - first, types.categories, np.arange(first, last + 1)
+
+
+def disaster_matrix(df_emdat):
+    """Disaster type x year count matrix shared by the heatmap, line, area and Sankey charts."""
+    type_codes, year_codes, types, years = disaster_codes(df_emdat)
+    valid = type_codes >= 0
+    shape = (len(types), len(years))
+    counts = np.bincount(type_codes[valid] * shape[1] + year_codes[valid], minlength=shape[0] * shape[1]).reshape(shape)
+    # Keep the types and years that occur (as the former group-by did)
+    rows, cols = counts.sum(axis=1) > 0, counts.sum(axis=0) > 0
+    return pd.DataFrame(counts[rows][:, cols], index=pd.Index(types[rows], name="Disaster Type"),
+                        columns=pd.Index(years[cols], name="Year"))
+
+
+def _matrix_cells(matrix):
+    """Non-zero cells of the type x year matrix as (type index, year index, count) arrays."""
+    values = matrix.to_numpy()
+    type_idx, year_idx = np.nonzero(values)
+    return type_idx, year_idx, values[type_idx, year_idx]
+
+
+def disaster_type_counts(df_emdat):
+    counts = df_emdat["Disaster Type"].value_counts()
+    counts = counts[counts > 0]  # unused categories of a categorical column
+    return pd.DataFrame({"Disaster Type": counts.index, "Count": counts.values})
+
+
+def _rotate_xticks(ax, rotation=45, ha="right"):
+    plt.setp(ax.get_xticklabels(), rotation=rotation, ha=ha)
+
+
+# ---- 03: Conflict events and fatalities per region ----
+def events_fatalities_bars(df):
+    fig, axes = plt.subplots(nrows=1, ncols=2, figsize=(16, 6))
+
+    # Plot for conflict events
+    sns.barplot(ax=axes[0], data=df, x='admin1', y='event_coun', color='blue')
+    axes[0].set_title('Number of Conflict Events per Region')
+    axes[0].set_xlabel('Region')
+    axes[0].set_ylabel('Event Count')
+    axes[0].tick_params(axis='x', rotation=45)
+
+    # Plot for fatalities
+    sns.barplot(ax=axes[1], data=df, x='admin1', y='fatalities', color='red')
+    axes[1].set_title('Number of Fatalities per Region')
+    axes[1].set_xlabel('Region')
+    axes[1].set_ylabel('Fatalities Count')
+    axes[1].tick_params(axis='x', rotation=45)
+
+    fig.tight_layout()
+    return fig
+
+
+def events_fatalities_stacked(df):
+    # Non-fatal events are the events left after subtracting fatalities
+    df = df.assign(non_fatal_events=df['event_coun'] - df['fatalities'])
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    df[['non_fatal_events', 'fatalities']].set_index(df['admin1']).plot(kind='bar', stacked=True, ax=ax, color=['skyblue', 'red'])
+    ax.set_title('Proportional Representation of Conflict Events and Fatalities per Region')
+    ax.set_xlabel('Region')
+    ax.set_ylabel('Count')
+    ax.tick_params(axis='x', rotation=45)
+    ax.legend(['Non-Fatal Events', 'Fatalities'])
+    fig.tight_layout()
+    return fig
+
+
+def events_bubble_chart(df):
+    fig = px.scatter(df, x="admin1", y="event_coun", size="fatalities", color="admin1",
+                     hover_name="admin1", size_max=60, title="Interactive Bubble Chart of Events and Fatalities")
+    fig.update_layout(xaxis_title="Region", yaxis_title="Number of Events")
+    return fig
+
+
+def events_fatalities_hbar(data, labels=None):
+    """Horizontal grouped bars of events and fatalities; ``labels`` renames the legend entries."""
+    labels = labels or {}
+    data = data.rename(columns=labels)
+    value_vars = [labels.get('event_coun', 'event_coun'), labels.get('fatalities', 'fatalities')]
+    data_melted = data.melt(id_vars=['admin1'], value_vars=value_vars, var_name='Type', value_name='Count')
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    sns.barplot(ax=ax, data=data_melted, y='admin1', x='Count', hue='Type', palette=['#3498db', '#e74c3c'])
+    ax.set_ylabel('Region')
+    ax.set_xlabel('Count')
+    ax.set_title('Proportional Representation of Conflict Events and Fatalities per Region')
+    fig.tight_layout()
+    return fig
+
+
+# ---- 04: Health facilities, conflict events and fatalities per region ----
+def health_facilities_choropleth(gdf, column="health_fac", title="Health Facilities per Region in Somalia"):
+    fig, ax = plt.subplots(1, 1, figsize=(10, 8))
+    gdf.plot(column=column, cmap="Blues", linewidth=0.8, edgecolor="black",
+             legend=True, legend_kwds={'label': "Number of Health Facilities", 'orientation': "vertical"}, ax=ax)
+    ax.set_title(title, fontsize=14)
+    ax.set_axis_off()
+    return fig
+
+
+def fatalities_vs_events_bar(df):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    df_sorted = df.sort_values(by="fatalities", ascending=False)
+    sns.barplot(ax=ax, data=df_sorted, x="admin1", y="fatalities", color="red", label="Fatalities")
+    sns.barplot(ax=ax, data=df_sorted, x="admin1", y="event_coun", color="blue", alpha=0.6, label="Conflict Events")
+    _rotate_xticks(ax)
+    ax.set_title("Fatalities vs. Conflict Events per Region")
+    ax.set_ylabel("Count")
+    ax.legend()
+    return fig
+
+
+def events_vs_facilities_scatter(df, facilities="health_fac"):
+    fig, ax = plt.subplots(figsize=(8, 6))
+    sns.scatterplot(ax=ax, data=df, x="event_coun", y=facilities, size="fatalities", hue="fatalities",
+                    palette="coolwarm", sizes=(20, 300))
+    ax.set_xlabel("Conflict Events")
+    ax.set_ylabel("Health Facilities")
+    ax.set_title("Conflict Events vs. Health Facilities")
+    ax.legend(title="Fatalities")
+    ax.grid(True)
+    return fig
+
+
+def facilities_vs_fatalities_bubble(df, facilities="health_fac"):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.scatterplot(ax=ax, data=df, x=facilities, y="fatalities", size="event_coun", hue="event_coun",
+                    palette="viridis", sizes=(20, 300))
+    ax.set_xlabel("Health Facilities")
+    ax.set_ylabel("Fatalities")
+    ax.set_title("Health Facilities vs. Fatalities (Bubble Size = Conflict Events)")
+    ax.legend(title="Conflict Events")
+    ax.grid(True)
+    return fig
+
+
+def proportional_bar(df):
+    fig, ax = plt.subplots(figsize=(14, 6))
+    regions = df["admin1"]
+
+    # Plot conflict events (negative for proportionality)
+    ax.bar(regions, -df["event_coun"], color="skyblue", label="Non-Fatal Events")
+    # Plot fatalities
+    ax.bar(regions, df["fatalities"], color="red", label="Fatalities")
+    # Plot health facilities (scaled to fit)
+    ax.bar(regions, df["health_facilities"] * 50, color="green", alpha=0.7, label="Health Facilities (Scaled)")
+
+    _rotate_xticks(ax)
+    ax.set_title("Proportional Representation of Conflict Events, Fatalities & Health Facilities per Region")
+    ax.set_ylabel("Count (Health Facilities Scaled x50)")
+    ax.legend()
+    return fig
+
+
+def side_by_side_bars(df):
+    fig, axes = plt.subplots(1, 3, figsize=(18, 5))
+    panels = [
+        ("event_coun", "blue", "Number of Conflict Events per Region", "Event Count"),
+        ("fatalities", "red", "Number of Fatalities per Region", "Fatalities Count"),
+        ("health_facilities", "green", "Number of Health Facilities per Region", "Health Facility Count"),
+    ]
+    for ax, (column, color, title, ylabel) in zip(axes, panels):
+        ax.bar(df["admin1"], df[column], color=color)
+        ax.set_title(title)
+        ax.set_ylabel(ylabel)
+        _rotate_xticks(ax)
+
+    fig.tight_layout()
+    return fig
+
+
+def stacked_bar(df):
+    fig, ax = plt.subplots(figsize=(14, 6))
+    ax.bar(df["admin1"], df["event_coun"], color="blue", label="Conflict Events")
+    ax.bar(df["admin1"], df["fatalities"], bottom=df["event_coun"], color="red", label="Fatalities")
+    ax.bar(df["admin1"], df["health_facilities"], bottom=df["event_coun"] + df["fatalities"], color="green", label="Health Facilities")
+
+    _rotate_xticks(ax)
+    ax.set_title("Stacked Representation of Health Facilities, Conflict Events & Fatalities")
+    ax.set_ylabel("Total Count")
+    ax.legend()
+    return fig
+
+
+def correlation_heatmap(df):
+    fig, ax = plt.subplots(figsize=(8, 6))
+    sns.heatmap(df[["fatalities", "event_coun", "health_facilities"]].corr(), annot=True, cmap="coolwarm", fmt=".2f", ax=ax)
+    ax.set_title("Correlation Heatmap: Conflict Events, Fatalities & Health Facilities")
+    return fig
+
+
+def pairplot(df):
+    g = sns.pairplot(df[["fatalities", "event_coun", "health_facilities"]], diag_kind="kde")
+    g.figure.suptitle("Pairwise Relationships: Conflict Events, Fatalities & Health Facilities", y=1.02)
+    return g.figure
+
+
+def multi_axis_line(df):
+    fig, ax1 = plt.subplots(figsize=(12, 6))
+
+    # First Y-axis (Conflict Events & Fatalities)
+    ax1.set_xlabel("Region")
+    ax1.set_ylabel("Conflict Events & Fatalities")
+    ax1.plot(df["admin1"], df["event_coun"], color="blue", marker="o", label="Conflict Events", linestyle="dashed")
+    ax1.plot(df["admin1"], df["fatalities"], color="red", marker="s", label="Fatalities", linestyle="solid")
+
+    # Second Y-axis (Health Facilities)
+    ax2 = ax1.twinx()
+    ax2.set_ylabel("Health Facilities")
+    ax2.plot(df["admin1"], df["health_facilities"], color="green", marker="D", label="Health Facilities", linestyle="dotted")
+
+    fig.tight_layout()
+    _rotate_xticks(ax1)
+    ax1.set_title("Multi-Axis Line Chart: Conflict Events, Fatalities & Health Facilities")
+
+    # Combine legends
+    lines_1, labels_1 = ax1.get_legend_handles_labels()
+    lines_2, labels_2 = ax2.get_legend_handles_labels()
+    ax1.legend(lines_1 + lines_2, labels_1 + labels_2, loc="upper left")
+    return fig
+
+
+def radar_chart(df):
+    categories = ["fatalities", "event_coun", "health_facilities"]
+
+    # Normalize data for better visualization
+    df_norm = df.copy()
+    for column in categories:
+        df_norm[column] = df[column] / df[column].max()
+
+    angles = [n / float(len(categories)) * 2 * pi for n in range(len(categories))]
+    angles += angles[:1]  # Repeat first angle to close the circle
+
+    fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(polar=True))
+    for _, row in df_norm.iterrows():
+        values = row[categories].tolist()
+        values += values[:1]  # Close the circle
+        ax.plot(angles, values, linewidth=1, linestyle="solid", label=row["admin1"])
+        ax.fill(angles, values, alpha=0.1)
+
+    ax.set_xticks(angles[:-1])
+    ax.set_xticklabels(categories)
+    ax.set_title("Radar Chart: Conflict Events, Fatalities & Health Facilities")
+    ax.legend(loc="upper right", bbox_to_anchor=(1.3, 1.1))
+    return fig
+
+
+# ---- 05: Conflicts and disasters over time ----
+def _yearly_bar(df, ylabel, title, **bar_kws):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    sns.barplot(ax=ax, data=df, x="Year", y="Count", **bar_kws)
+    _rotate_xticks(ax)
+    ax.set_xlabel("Year", fontsize=12)
+    ax.set_ylabel(ylabel, fontsize=12)
+    ax.set_title(title, fontsize=14, fontweight="bold")
+    ax.grid(True, linestyle="--", linewidth=0.7, color="purple", alpha=0.3)
+    return fig
+
+
+def conflicts_per_year_bar(df_conflicts):
+    return _yearly_bar(df_conflicts, "Count", "Number of Conflicts per Year", color="skyblue")
+
+
+def disasters_per_year_bar(df_disasters):
+    return _yearly_bar(df_disasters, "Number of Disasters", "Number of Disasters per Year (EMDAT - Somalia)",
+                       color="lightcoral", alpha=0.7)
+
+
+def disaster_heatmap(matrix):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    sns.heatmap(matrix, cmap="coolwarm", linewidths=0.5, annot=True, fmt=".0f", ax=ax)
+    ax.set_title("Disaster Frequency Over Time (Heatmap)", fontsize=14, fontweight="bold")
+    ax.set_xlabel("Year")
+    ax.set_ylabel("Disaster Type")
+    return fig
+
+
+def disaster_trend_lines(matrix):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    type_idx, year_idx, counts = _matrix_cells(matrix)
+    trend = pd.DataFrame({"Year": matrix.columns.to_numpy()[year_idx],
+                          "Disaster Type": matrix.index.to_numpy()[type_idx], "Count": counts})
+    sns.lineplot(ax=ax, data=trend, x="Year", y="Count", hue="Disaster Type", marker="o")
+    ax.set_title("Disaster Trends Over Time (Line Chart)", fontsize=14, fontweight="bold")
+    ax.set_xlabel("Year")
+    ax.set_ylabel("Number of Disasters")
+    ax.grid(True, linestyle="--", alpha=0.5)
+    ax.legend(title="Disaster Type", bbox_to_anchor=(1.05, 1), loc="upper left")
+    return fig
+
+
+def disaster_stacked_area(matrix):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    matrix.T.plot.area(ax=ax, alpha=0.6, colormap="tab10")
+    ax.set_title("Disaster Type Distribution Over Time (Stacked Area Chart)", fontsize=14, fontweight="bold")
+    ax.set_xlabel("Year")
+    ax.set_ylabel("Number of Disasters")
+    ax.grid(True, linestyle="--", alpha=0.5)
+    return fig
+
+
+def disaster_wordcloud(disaster_types):
+    fig, ax = plt.subplots(figsize=(8, 6))
+    cloud = wordcloud.WordCloud(width=800, height=400, background_color="white").generate(" ".join(disaster_types))
+    ax.imshow(cloud, interpolation="bilinear")
+    ax.axis("off")
+    ax.set_title("Most Common Disaster Types (Word Cloud)", fontsize=14, fontweight="bold")
+    return fig
+
+
+def disaster_sankey(matrix):
+    # Nodes are the disaster types followed by the years; links are the non-zero matrix cells
+    type_idx, year_idx, counts = _matrix_cells(matrix)
+    fig = go.Figure(go.Sankey(
+        node=dict(label=[str(t) for t in matrix.index] + [str(y) for y in matrix.columns]),
+        link=dict(source=type_idx, target=len(matrix.index) + year_idx, value=counts)
+    ))
+    fig.update_layout(title_text="Disaster Type Flow Over Time (Sankey Diagram)")
+    return fig
+
+
+def disaster_types_bar(df_disasters, palette="coolwarm", ylabel="Disaster Type",
+                       title="Disaster Types in Somalia (EMDAT Data)"):
+    fig, ax = plt.subplots(figsize=(12, 7))
+    sns.barplot(ax=ax, data=df_disasters, x="Count", y="Disaster Type", palette=palette, edgecolor="black")
+    ax.set_xlabel("Number of Disasters", fontsize=13, fontweight="bold")
+    ax.set_ylabel(ylabel, fontsize=13, fontweight="bold")
+    ax.set_title(title, fontsize=15, fontweight="bold")
+    ax.grid(axis="x", linestyle="--", alpha=0.5)
+
+    # Show values on bars
+    for index, value in enumerate(df_disasters["Count"]):
+        ax.text(value + 0.5, index, str(value), va="center", fontsize=12, fontweight="bold")
+    return fig
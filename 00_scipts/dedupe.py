@@ -0,0 +1,97 @@
+# Collapsing of duplicate event coordinates before spatial work.
+#
+# ACLED geo-precision places many events on the same district or town
+# centroid. Locations groups a point set into its unique (x, y) pairs with one
+# np.unique over the raw coordinate bytes: the spatial work (point in polygon,
+# KD-tree neighbour queries) runs once per unique location, and the results
+# are broadcast back to the events through the inverse index, or summed per
+# location (event counts, fatalities) with one bincount.
+#
+#   python dedupe.py ACLED.shp [REGIONS.shp]   # unique share and per-event vs per-location timings
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from reproject import points_xy
+
+
+class Locations:
+    """Unique coordinates of a point set and the map from its rows to them."""
+
+    def __init__(self, x, y, inverse, counts):
+        self.x, self.y = x, y
+        self.inverse = inverse  # location of every input row
+        self.counts = counts    # input rows per location
+
+    @classmethod
+    def from_xy(cls, x, y):
+        xy = np.column_stack([np.asarray(x, dtype="float64"), np.asarray(y, dtype="float64")])
+        # Each (x, y) pair as one 16-byte key: exact coordinate equality, NaN pairs grouped together
+        keys = np.ascontiguousarray(xy).view(np.dtype((np.void, xy.dtype.itemsize * 2))).ravel()
+        _, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+        return cls(xy[first, 0], xy[first, 1], inverse.ravel(), counts)
+
+    @classmethod
+    def from_gdf(cls, gdf, crs=None):
+        return cls.from_xy(*points_xy(gdf, crs))
+
+    def __len__(self):
+        return len(self.x)
+
+    @property
+    def xy(self):
+        return np.column_stack([self.x, self.y])
+
+    @property
+    def share(self):
+        """Unique locations as a fraction of the input rows."""
+        return len(self) / max(len(self.inverse), 1)
+
+    def broadcast(self, values):
+        """Per-location ``values`` expanded to one value per input row."""
+        return np.asarray(values)[self.inverse]
+
+    def total(self, weights):
+        """Sum of the per-row ``weights`` at every location (NaN counts as 0)."""
+        weights = np.nan_to_num(np.asarray(pd.to_numeric(weights, errors="coerce"), dtype="float64"))
+        return np.bincount(self.inverse, weights=weights, minlength=len(self))
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    from accessibility import _brute_force, facility_exposure, projected_xy
+    from cache import read_layer
+
+    acled_gdf = read_layer(sys.argv[1])
+    locations, seconds = _timed(Locations.from_gdf, acled_gdf)
+    print(f"{len(acled_gdf)} events at {len(locations)} unique locations ({locations.share:.1%}), "
+          f"grouped in {seconds:.4f} s")
+
+    if len(sys.argv) > 2:
+        from regions import RegionIndex
+
+        index = RegionIndex(read_layer(sys.argv[2]))
+        x, y = points_xy(acled_gdf, index.crs)
+        per_event, event_s = _timed(index._exact, x, y)
+        unique = Locations.from_xy(x, y)
+        per_location, location_s = _timed(lambda: unique.broadcast(index._exact(unique.x, unique.y)))
+        print(f"exact region test per event: {event_s:.4f} s, per location: {location_s:.4f} s, "
+              f"same codes: {np.array_equal(per_event, per_location)}")
+
+    # Facility exposure against the events, checked with the all-pairs reference (one site in 40 events)
+    xy = projected_xy(acled_gdf)
+    xy = xy[np.isfinite(xy).all(axis=1)]
+    fatalities = np.ones(len(xy))
+    sites = xy[:: 40] + 1_000.0
+    got, seconds = _timed(facility_exposure, sites, xy, [5_000, 25_000], fatalities)
+    expected = _brute_force(sites, xy, [5_000, 25_000], fatalities)
+    print(f"facility_exposure for {len(sites)} sites: {seconds:.4f} s, matches all pairs: "
+          f"{all(np.allclose(a, b) for a, b in zip(got, expected))}")
@@ -0,0 +1,241 @@
+# Precomputed region x month x event type cube of ACLED events.
+#
+# Every event is binned once into a dense array of event counts and fatality
+# sums with shape (region, month, event type). Yearly trends, regional
+# totals, region/year heatmaps and the per-type breakdowns used by the chart
+# scripts are then slices and sums over that array instead of group-bys over
+# every event. The month axis covers whole calendar years so that years are
+# a plain reshape of it.
+#
+# Cubes are stored under 01_data/.cache/event_cube/ as .npy arrays
+# (memory-mapped on load) plus a JSON file with the axis labels and the
+# fingerprint of the ACLED and region layers they were built from.
+#
+#   python event_cube.py ACLED.shp [REGIONS.shp]
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from cache import CACHE_DIR, content_hash, source_files, source_stat
+from regions import OUTSIDE
+
+
+OUTSIDE_LABEL = "(outside)"  # last region slot: events outside every region polygon
+MISSING_LABEL = "(no region)"  # last region slot: events without a ``region_col`` value
+ALL_LABEL = "Somalia"        # single region slot when the cube is built without a region layer
+CUBE_COLUMNS = ["event_date", "event_type", "fatalities"]  # ACLED fields read to build a cube
+CUBE_VERSION = 2  # bumped when the binning changes, so cached cubes are rebuilt
+
+
+class EventCube:
+    """Event counts and fatality sums over (region, month, event type)."""
+
+    def __init__(self, counts, fatalities, regions, first_year, event_types):
+        self.counts = counts
+        self.fatalities = fatalities
+        self.regions = list(regions)
+        self.first_year = int(first_year)
+        self.event_types = list(event_types)
+
+    @property
+    def years(self):
+        return np.arange(self.first_year, self.first_year + self.counts.shape[1] // 12)
+
+    @property
+    def months(self):
+        return np.datetime64(f"{self.first_year}-01", "M") + np.arange(self.counts.shape[1])
+
+    # ---- Building ----
+    @classmethod
+    def build(cls, acled_gdf, region_index=None, region_col=None, verbose=True):
+        """Bin every event of ``acled_gdf`` (with ``event_date`` and ``event_type``) into a cube.
+
+        Regions come from ``region_index`` (point in polygon), or else from the
+        ``region_col`` attribute of the events (events without one go to the
+        MISSING_LABEL slot, so they still count in the yearly totals).
+        """
+        dates = pd.to_datetime(acled_gdf["event_date"], errors="coerce")
+        dated = dates.notna().to_numpy(copy=True)
+        if verbose and not dated.all():
+            print(f"EventCube: {int((~dated).sum())} events without a valid event_date were left out")
+
+        if region_col is not None and region_index is None:
+            by_attribute = pd.Categorical(acled_gdf[region_col])
+            codes = by_attribute.codes[dated].astype(np.int64)
+            regions = [str(name) for name in by_attribute.categories] + [MISSING_LABEL]
+            codes[codes < 0] = len(regions) - 1
+        elif region_index is not None:
+            codes = np.asarray(region_index.assign(acled_gdf), dtype=np.int64)[dated]
+            regions = [str(name) for name in region_index.names] + [OUTSIDE_LABEL]
+            codes[codes == OUTSIDE] = len(regions) - 1
+        else:
+            codes = np.zeros(int(dated.sum()), dtype=np.int64)
+            regions = [ALL_LABEL]
+
+        months = dates[dated].to_numpy().astype("datetime64[M]").astype(np.int64)  # months since 1970-01
+        first_year = 1970 + int(months.min()) // 12 if len(months) else 1970
+        last_year = 1970 + int(months.max()) // 12 if len(months) else 1970
+        n_months = 12 * (last_year - first_year + 1)
+        month_idx = months - 12 * (first_year - 1970)
+
+        types = pd.Categorical(acled_gdf["event_type"].astype(str).to_numpy()[dated])
+        n_types = len(types.categories)
+
+        shape = (len(regions), n_months, n_types)
+        key = (codes * n_months + month_idx) * n_types + types.codes
+        size = int(np.prod(shape))
+        counts = np.bincount(key, minlength=size).reshape(shape).astype(np.int32)
+        if "fatalities" in acled_gdf.columns:
+            weights = np.nan_to_num(pd.to_numeric(acled_gdf["fatalities"], errors="coerce").to_numpy(dtype="float64")[dated])
+        else:
+            weights = np.zeros(len(key))
+        fatalities = np.bincount(key, weights=weights, minlength=size).reshape(shape).astype(np.int32)
+        return cls(counts, fatalities, regions, first_year, types.categories)
+
+    # ---- Storage ----
+    def save(self, directory, **source):
+        """Write the arrays and their labels (``source`` adds fingerprint fields to labels.json)."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "counts.npy"), self.counts)
+        np.save(os.path.join(directory, "fatalities.npy"), self.fatalities)
+        _write_labels(directory, {"regions": self.regions, "first_year": self.first_year,
+                                  "event_types": self.event_types, **source})
+
+    @classmethod
+    def load(cls, directory):
+        labels = _read_labels(directory)
+        counts = np.load(os.path.join(directory, "counts.npy"), mmap_mode="r")
+        fatalities = np.load(os.path.join(directory, "fatalities.npy"), mmap_mode="r")
+        return cls(counts, fatalities, labels["regions"], labels["first_year"], labels["event_types"])
+
+    # ---- Slices ----
+    def _values(self, measure):
+        return self.counts if measure == "count" else self.fatalities
+
+    def by_year(self, measure="count"):
+        """(region, year, event type) array."""
+        values = self._values(measure)
+        r, m, t = values.shape
+        return np.asarray(values).reshape(r, m // 12, 12, t).sum(axis=2)
+
+    def yearly(self, measure="count", label="Year"):
+        """Totals per year as a (label, Count) DataFrame, like charts.year_counts (years without events left out)."""
+        totals = self.by_year(measure).sum(axis=(0, 2))
+        keep = totals > 0
+        return pd.DataFrame({label: self.years[keep], "Count": totals[keep]})
+
+    def per_region(self, measure="count", include_outside=False):
+        """Totals per region as a Series, largest first (events outside or without a region only on request)."""
+        totals = pd.Series(np.asarray(self._values(measure)).sum(axis=(1, 2)), index=self.regions)
+        if not include_outside:
+            totals = totals.drop([OUTSIDE_LABEL, MISSING_LABEL], errors="ignore")
+        return totals.sort_values(ascending=False)
+
+    def region_year(self, measure="count"):
+        """Region x year table (heatmaps)."""
+        return pd.DataFrame(self.by_year(measure).sum(axis=2), index=self.regions, columns=self.years)
+
+    def type_year(self, measure="count"):
+        """Event type x year table (stacked areas and heatmaps by type)."""
+        return pd.DataFrame(self.by_year(measure).sum(axis=0).T, index=self.event_types, columns=self.years)
+
+    def monthly(self, region=None, event_type=None, measure="count"):
+        """Monthly series, optionally restricted to one region and/or one event type."""
+        values = self._values(measure)
+        if region is not None:
+            values = values[self.regions.index(region)][None]
+        if event_type is not None:
+            values = values[:, :, self.event_types.index(event_type)][:, :, None]
+        return pd.Series(np.asarray(values).sum(axis=(0, 2)), index=pd.PeriodIndex(self.months, freq="M"))
+
+
+def _write_labels(directory, labels):
+    # labels.json is written last (atomically), so a half-written cube is never loaded
+    tmp = os.path.join(directory, "labels.json.tmp")
+    with open(tmp, "w") as fh:
+        json.dump(labels, fh, indent=1)
+    os.replace(tmp, os.path.join(directory, "labels.json"))
+
+
+def _read_labels(directory):
+    try:
+        with open(os.path.join(directory, "labels.json")) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def cached_cube(acled_path, regions_path=None, name_col="admin1", region_col=None, cache_dir=CACHE_DIR,
+                verbose=False):
+    """Load the cube of ``acled_path`` from the cache, building it on a miss.
+
+    Events are grouped by the ``name_col`` regions of ``regions_path``, or by
+    their own ``region_col`` attribute, or into a single region.
+
+    As in cache.read_layer, the sources are only re-hashed when their size or
+    mtime changed, and the cube is rebuilt only when their content changed.
+    """
+    from cache import read_layer
+
+    files = source_files(acled_path) + (source_files(regions_path) if regions_path else [])
+    stem = os.path.splitext(os.path.basename(acled_path))[0]
+    if regions_path:
+        by = f"{os.path.splitext(os.path.basename(regions_path))[0]}-{name_col}"
+    else:
+        by = region_col or "all"
+    directory = os.path.join(cache_dir, "event_cube", f"{stem}-{by}")
+    stat = source_stat(files)
+
+    labels = _read_labels(directory)
+    if labels is not None and labels.get("version") != CUBE_VERSION:
+        labels = None  # built by an older binning: rebuild
+    if labels is not None:
+        if labels["stat"] == stat:
+            return EventCube.load(directory)
+        digest = content_hash(files)
+        if labels["hash"] == digest:
+            labels["stat"] = stat
+            _write_labels(directory, labels)
+            return EventCube.load(directory)
+    else:
+        digest = content_hash(files)
+
+    region_index = None
+    if regions_path:
+        from regions import RegionIndex
+        region_index = RegionIndex(read_layer(regions_path), name_col=name_col)
+    # Only the fields the cube bins are loaded; the geometry only for a point-in-region join
+    columns = CUBE_COLUMNS + ([region_col] if region_col and region_index is None else [])
+    acled = read_layer(acled_path, columns=list(dict.fromkeys(columns)), geometry=region_index is not None)
+    cube = EventCube.build(acled, region_index, region_col, verbose=verbose)
+    cube.save(directory, stat=stat, hash=digest, version=CUBE_VERSION)
+    return cube
+
+
+if __name__ == "__main__":
+    import geopandas as gpd
+
+    parser = argparse.ArgumentParser(description="Build the event cube and compare its slices with pandas group-bys.")
+    parser.add_argument("acled")
+    parser.add_argument("regions", nargs="?")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cube = cached_cube(args.acled, args.regions, verbose=True)
+    print(f"Cube {cube.counts.shape} ready in {time.perf_counter() - start:.3f} s")
+
+    acled = gpd.read_file(args.acled)
+    start = time.perf_counter()
+    expected = pd.to_datetime(acled["event_date"], errors="coerce").dt.year.value_counts().sort_index()
+    groupby_s = time.perf_counter() - start
+    start = time.perf_counter()
+    yearly = cube.yearly()
+    cube_s = time.perf_counter() - start
+    print(f"Yearly counts: group-by {groupby_s * 1e3:.2f} ms, cube {cube_s * 1e3:.2f} ms")
+    print("Matches the group-by:", np.array_equal(yearly["Count"].to_numpy(), expected.to_numpy()))
+    print(cube.type_year())
@@ -0,0 +1,273 @@
+# Incremental append mode for the weekly ACLED refresh.
+#
+# A ledger of every processed event (ID, region code, fatalities and
+# coordinates) is kept under 01_data/.cache/acled_incremental/, together with
+# the per-region event_count/fatalities totals and the last processed
+# event_date/event ID. An update reads the new export, matches it against the
+# ledger by event ID and:
+#   - joins and adds events with an unknown ID,
+#   - applies a delta for known IDs whose fatalities or location were revised
+#     (only moved events are joined again),
+#   - skips events that are unchanged,
+#   - removes the events listed in ``deleted_ids``.
+# The cost of a refresh therefore follows the size of the export passed in;
+# the full history is only read once, when the ledger is first built. When the
+# region layer changes, the stored events are joined again from their ledger
+# coordinates, so the history does not have to be read again.
+#
+#   python incremental.py ACLED_new_events.shp|.csv REGIONS.shp [--deleted ids.txt] [--rebuild]
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregate import region_table
+from cache import CACHE_DIR, content_hash, source_files
+from regions import OUTSIDE
+from reproject import transform_xy
+from streaming import _coordinates, iter_chunks
+
+
+STATE_DIR = os.path.join(CACHE_DIR, "acled_incremental")
+ID_COLUMNS = ("event_id_cnty", "event_id_c")  # full ACLED name, and as truncated in shapefiles
+LEDGER_FIELDS = ("ids", "codes", "fatalities", "x", "y")
+
+
+def _id_column(chunk):
+    for column in ID_COLUMNS:
+        if column in chunk.columns:
+            return column
+    raise ValueError(f"The ACLED data does not contain an event ID column ({' or '.join(ID_COLUMNS)}).")
+
+
+def _same(a, b):
+    """Element-wise equality that treats two NaNs as equal."""
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+class EventLedger:
+    """Per-event record of the processed ACLED events plus the per-region totals.
+
+    The ledger arrays are kept sorted by event ID so that an update looks up
+    its IDs with a binary search.
+    """
+
+    def __init__(self, names, regions_hash, crs=None):
+        self.names = [str(name) for name in names]
+        self.regions_hash = regions_hash
+        self.crs = crs  # CRS of the stored x/y (WKT)
+        self.ids = np.empty(0, dtype="S1")
+        self.codes = np.empty(0, dtype=np.int32)
+        self.fatalities = np.empty(0, dtype="float64")
+        self.x = np.empty(0, dtype="float64")
+        self.y = np.empty(0, dtype="float64")
+        self.event_count = np.zeros(len(self.names), dtype=np.int64)
+        self.fatality_total = np.zeros(len(self.names), dtype="float64")
+        self.last_event_date = None
+        self.last_event_id = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---- Storage ----
+    @classmethod
+    def load(cls, state_dir=STATE_DIR):
+        """Return the stored ledger, or None if there is none."""
+        try:
+            with open(os.path.join(state_dir, "state.json")) as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        ledger = cls(state["names"], state["regions_hash"], state.get("crs"))
+        for field in LEDGER_FIELDS:
+            setattr(ledger, field, np.load(os.path.join(state_dir, f"{field}.npy")))
+        ledger.event_count = np.asarray(state["event_count"], dtype=np.int64)
+        ledger.fatality_total = np.asarray(state["fatalities"], dtype="float64")
+        ledger.last_event_date = state["last_event_date"]
+        ledger.last_event_id = state["last_event_id"]
+        return ledger
+
+    def save(self, state_dir=STATE_DIR):
+        os.makedirs(state_dir, exist_ok=True)
+        for field in LEDGER_FIELDS:
+            np.save(os.path.join(state_dir, f"{field}.npy"), getattr(self, field))
+        state = {
+            "names": self.names,
+            "regions_hash": self.regions_hash,
+            "crs": self.crs,
+            "event_count": self.event_count.tolist(),
+            "fatalities": self.fatality_total.tolist(),
+            "last_event_date": self.last_event_date,
+            "last_event_id": self.last_event_id,
+            "events": len(self),
+        }
+        # state.json is written last, so an interrupted save leaves the previous state readable
+        tmp = os.path.join(state_dir, "state.json.tmp")
+        with open(tmp, "w") as fh:
+            json.dump(state, fh, indent=1)
+        os.replace(tmp, os.path.join(state_dir, "state.json"))
+
+    # ---- Updates ----
+    def _lookup(self, ids):
+        """Ledger position of every ID and whether it is already known."""
+        pos = np.searchsorted(self.ids, ids)
+        known = pos < len(self.ids)
+        known[known] = self.ids[pos[known]] == ids[known]
+        return pos, known
+
+    def _add_totals(self, codes, fatalities, sign=1):
+        inside = codes != OUTSIDE
+        n = len(self.names)
+        self.event_count += sign * np.bincount(codes[inside], minlength=n)
+        self.fatality_total += sign * np.bincount(codes[inside], weights=np.nan_to_num(fatalities[inside]), minlength=n)
+
+    def apply(self, ids, x, y, fatalities, region_index):
+        """Add new events and apply deltas for revised ones; returns (new, revised, unchanged) counts."""
+        pos, known = self._lookup(ids)
+
+        # Known events: compare with the ledger, re-join only the ones that moved
+        kpos = pos[known]
+        moved = ~(_same(x[known], self.x[kpos]) & _same(y[known], self.y[kpos]))
+        revised = moved | ~_same(fatalities[known], self.fatalities[kpos])
+        rpos = kpos[revised]
+        new_codes = self.codes[rpos].copy()
+        if moved.any():
+            new_codes[moved[revised]] = region_index.assign_xy(x[known][moved], y[known][moved])
+        self._add_totals(self.codes[rpos], self.fatalities[rpos], sign=-1)
+        self._add_totals(new_codes, fatalities[known][revised])
+        self.codes[rpos] = new_codes
+        self.fatalities[rpos] = fatalities[known][revised]
+        self.x[rpos] = x[known][revised]
+        self.y[rpos] = y[known][revised]
+
+        # New events: join them and insert them at their sorted position
+        new = ~known
+        codes = region_index.assign_xy(x[new], y[new]).astype(np.int32)
+        self._add_totals(codes, fatalities[new])
+        order = np.argsort(ids[new], kind="stable")
+        at = pos[new][order]
+        width = max(self.ids.dtype.itemsize, ids.dtype.itemsize)
+        self.ids = np.insert(self.ids.astype(f"S{width}"), at, ids[new][order])
+        self.codes = np.insert(self.codes, at, codes[order])
+        self.fatalities = np.insert(self.fatalities, at, fatalities[new][order])
+        self.x = np.insert(self.x, at, x[new][order])
+        self.y = np.insert(self.y, at, y[new][order])
+        return int(new.sum()), int(revised.sum()), int(known.sum() - revised.sum())
+
+    def rejoin(self, region_index, regions_hash):
+        """Join every stored event again with ``region_index`` and recompute the totals."""
+        crs = region_index.crs.to_wkt() if region_index.crs is not None else None
+        self.x, self.y = transform_xy(self.x, self.y, self.crs, crs)
+        self.codes = region_index.assign_xy(self.x, self.y).astype(np.int32)
+        self.names = [str(name) for name in region_index.names]
+        self.regions_hash, self.crs = regions_hash, crs
+        self.event_count = np.zeros(len(self.names), dtype=np.int64)
+        self.fatality_total = np.zeros(len(self.names), dtype="float64")
+        self._add_totals(self.codes, self.fatalities)
+
+    def remove(self, ids):
+        """Drop deleted events (and their contribution to the totals); returns how many were found."""
+        ids = np.unique(np.asarray(ids, dtype="S"))
+        pos, known = self._lookup(ids)
+        pos = pos[known]
+        self._add_totals(self.codes[pos], self.fatalities[pos], sign=-1)
+        for field in LEDGER_FIELDS:
+            setattr(self, field, np.delete(getattr(self, field), pos))
+        return len(pos)
+
+    def mark(self, dates, ids):
+        """Record the latest event_date (and its event ID) seen so far."""
+        dates = pd.to_datetime(pd.Series(dates), errors="coerce").reset_index(drop=True)
+        if dates.notna().any():
+            i = dates.idxmax()
+            latest = dates[i].strftime("%Y-%m-%d")
+            if self.last_event_date is None or latest >= self.last_event_date:
+                self.last_event_date = latest
+                self.last_event_id = ids[i].decode()
+
+
+def _regions_hash(regions_path):
+    return content_hash(source_files(regions_path))
+
+
+def update(acled_path, regions_path, state_dir=STATE_DIR, deleted_ids=(), chunksize=100_000,
+           name_col="admin1", rebuild=False, verbose=True):
+    """Fold an ACLED export into the stored ledger and return the updated ledger.
+
+    The stored events are joined again with the region layer when
+    ``rebuild`` is set or when the layer differs from the one the ledger was
+    built with. Without a stored ledger, ``acled_path`` must hold the full
+    event history.
+    """
+    from cache import read_layer
+    from regions import RegionIndex
+
+    regions_gdf = read_layer(regions_path)
+    regions_hash = _regions_hash(regions_path)
+    region_index = RegionIndex(regions_gdf, name_col=name_col)
+
+    ledger = EventLedger.load(state_dir)
+    if ledger is None:
+        crs = region_index.crs.to_wkt() if region_index.crs is not None else None
+        ledger = EventLedger(region_index.names, regions_hash, crs)
+    elif rebuild or ledger.regions_hash != regions_hash:
+        if verbose:
+            print(f"update: joining the {len(ledger)} stored events with the region layer again")
+        ledger.rejoin(region_index, regions_hash)
+
+    start = time.perf_counter()
+    counts = np.zeros(3, dtype=np.int64)
+    for chunk in iter_chunks(acled_path, chunksize):
+        id_col = _id_column(chunk)
+        # The last row of an ID that appears twice in the export wins
+        chunk = chunk.drop_duplicates(subset=id_col, keep="last")
+        ids = chunk[id_col].astype(str).to_numpy().astype("S")
+        x, y = _coordinates(chunk, region_index.crs)
+        fatalities = (pd.to_numeric(chunk["fatalities"], errors="coerce").to_numpy(dtype="float64")
+                      if "fatalities" in chunk.columns else np.zeros(len(chunk)))
+        counts += ledger.apply(ids, x, y, fatalities, region_index)
+        if "event_date" in chunk.columns:
+            ledger.mark(chunk["event_date"], ids)
+
+    removed = ledger.remove(deleted_ids) if len(deleted_ids) else 0
+    ledger.save(state_dir)
+    if verbose:
+        new, revised, unchanged = counts.tolist()
+        print(f"update: {new} new, {revised} revised, {unchanged} unchanged, {removed} deleted "
+              f"in {time.perf_counter() - start:.2f} s; ledger holds {len(ledger)} events "
+              f"up to {ledger.last_event_date} ({ledger.last_event_id})")
+    return ledger
+
+
+def ledger_region_table(ledger, regions_gdf, health_codes=None):
+    """Region table of 02_fatalities.py from the stored totals."""
+    layers = {"health_facilities": health_codes} if health_codes is not None else {}
+    table = region_table(regions_gdf, layers)
+    table["event_count"] = ledger.event_count
+    totals = ledger.fatality_total
+    table["fatalities"] = totals.astype(np.int64) if np.all(totals == np.round(totals)) else totals
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold a new ACLED export into the incremental region totals.")
+    parser.add_argument("acled", help="ACLED export with new or revised events (shapefile or CSV)")
+    parser.add_argument("regions", help="admin1 region layer")
+    parser.add_argument("--deleted", help="text file with one deleted event ID per line")
+    parser.add_argument("--rebuild", action="store_true", help="join the stored events with the region layer again")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    args = parser.parse_args()
+
+    deleted = []
+    if args.deleted:
+        with open(args.deleted) as fh:
+            deleted = [line.strip() for line in fh if line.strip()]
+
+    ledger = update(args.acled, args.regions, args.state_dir, deleted, args.chunksize, rebuild=args.rebuild)
+    print(pd.DataFrame({"admin1": ledger.names, "event_count": ledger.event_count,
+                        "fatalities": ledger.fatality_total}))
@@ -0,0 +1,220 @@
+# Stage-level timing and memory instrumentation.
+#
+# Set GEOHEALTH_TRACE=1 (or GEOHEALTH_TRACE=path/to/trace.json) to record a
+# span for every instrumented step: the pipeline stages and, inside them,
+# layer reads, reprojection, region assignment, aggregation, shapefile writes
+# and figure rendering. Each span keeps its wall time, the tracemalloc peak
+# of Python allocations made inside it, the process peak RSS, and the row
+# counts going in and out. GEOHEALTH_PROFILE=1 additionally runs every
+# top-level span under cProfile and writes a .prof file next to the trace.
+#
+# At the end of the run the spans are written as a JSON trace (default
+# 04_outputs/traces/trace_<time>.json) and summarised in a table. When
+# GEOHEALTH_TRACE is unset, span() returns one shared no-op object, so the
+# hooks cost an environment lookup at import and a function call per step.
+#
+#   GEOHEALTH_TRACE=1 python pipeline.py --force region_table
+#   python instrument.py TRACE.json          # print the summary of a saved trace
+
+import atexit
+import datetime
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+
+_TRACE = os.environ.get("GEOHEALTH_TRACE", "")
+ENABLED = _TRACE not in ("", "0")
+PROFILE = ENABLED and os.environ.get("GEOHEALTH_PROFILE", "") not in ("", "0")
+TRACE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "04_outputs", "traces")
+
+_MB = 1024 * 1024
+_spans = []  # finished span records, in completion order
+_stack = []  # open spans
+_profiling = False
+_written = False
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(peak / (_MB if sys.platform == "darwin" else 1024), 1)
+
+
+class _NullSpan:
+    """Shared span used while tracing is disabled; attribute writes are ignored."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed step. Set ``rows_out`` (and optionally ``rows_in``) inside the ``with`` block."""
+
+    def __init__(self, name, rows_in=None, **attributes):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.attributes = attributes
+        self._child_peak = 0
+        self._profiler = None
+
+    def __enter__(self):
+        if _stack:
+            # tracemalloc keeps a single peak: fold the parent's peak so far in before resetting it
+            parent = _stack[-1]
+            parent._child_peak = max(parent._child_peak, tracemalloc.get_traced_memory()[1])
+        _stack.append(self)
+        self._traced_start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        self._rss_start = _peak_rss_mb()
+
+        global _profiling
+        if PROFILE and not _profiling:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            _profiling = True
+            self._profiler.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        global _profiling
+        if self._profiler is not None:
+            self._profiler.disable()
+            _profiling = False
+
+        peak = max(tracemalloc.get_traced_memory()[1], self._child_peak)
+        _stack.pop()
+        if _stack:
+            _stack[-1]._child_peak = max(_stack[-1]._child_peak, peak)
+
+        record = {
+            "name": self.name,
+            "parent": _stack[-1].name if _stack else None,
+            "path": [open_span.name for open_span in _stack] + [self.name],
+            "depth": len(_stack),
+            "start": round(self._start - _T0, 4),
+            "seconds": round(seconds, 4),
+            "traced_peak_mb": round(max(peak - self._traced_start, 0) / _MB, 2),
+            "rss_peak_mb": _peak_rss_mb(),
+            "rss_growth_mb": None,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            **self.attributes,
+        }
+        if record["rss_peak_mb"] is not None:
+            record["rss_growth_mb"] = round(record["rss_peak_mb"] - self._rss_start, 1)
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self._profiler is not None:
+            record["profile"] = _save_profile(self._profiler, self.name)
+        _spans.append(record)
+        return False
+
+
+def span(name, rows_in=None, **attributes):
+    """Context manager timing one step: ``with span("sjoin", rows_in=len(df)) as s: ...; s.rows_out = n``."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return Span(name, rows_in, **attributes)
+
+
+def _save_profile(profiler, name):
+    os.makedirs(_trace_dir(), exist_ok=True)
+    path = os.path.join(_trace_dir(), f"{_RUN_ID}_{name.replace(os.sep, '_').replace(':', '_')}.prof")
+    profiler.dump_stats(path)
+    return path
+
+
+def _trace_dir():
+    return os.path.dirname(os.path.abspath(_TRACE)) if _TRACE.endswith(".json") else TRACE_DIR
+
+
+# ---- Trace output ----
+def spans():
+    """Finished span records of this run."""
+    return list(_spans)
+
+
+def summary(records):
+    """Text table of calls, total seconds, memory peaks and rows per span, nested under the enclosing span."""
+    rows = {}
+    for rec in sorted(records, key=lambda rec: rec["start"]):
+        # Rows are keyed by the full path of enclosing spans, so a step named like its stage nests once
+        path = tuple(rec.get("path") or ([rec["parent"]] if rec["parent"] else []) + [rec["name"]])
+        row = rows.setdefault(path, {"calls": 0, "seconds": 0.0, "traced": 0.0, "rss": 0.0, "rows_in": 0,
+                                     "rows_out": 0})
+        row["calls"] += 1
+        row["seconds"] += rec["seconds"]
+        row["traced"] = max(row["traced"], rec["traced_peak_mb"])
+        row["rss"] = max(row["rss"], rec["rss_peak_mb"] or 0)
+        row["rows_in"] += rec["rows_in"] or 0
+        row["rows_out"] += rec["rows_out"] or 0
+
+    lines = [f"{'span':<34s} {'calls':>5s} {'seconds':>9s} {'traced MB':>10s} {'RSS MB':>8s} "
+             f"{'rows in':>11s} {'rows out':>11s}"]
+
+    def emit(parent):
+        for path, row in rows.items():
+            if path[:-1] != parent:
+                continue
+            label = "  " * (len(path) - 1) + path[-1]
+            lines.append(f"{label[:34]:<34s} {row['calls']:5d} {row['seconds']:9.3f} {row['traced']:10.1f} "
+                         f"{row['rss']:8.1f} {row['rows_in'] or '':>11} {row['rows_out'] or '':>11}")
+            emit(path)
+
+    emit(())
+    return "\n".join(lines)
+
+
+def write_trace(path=None):
+    """Write the spans recorded so far as JSON; returns the path."""
+    if path is None:
+        path = _TRACE if _TRACE.endswith(".json") else os.path.join(TRACE_DIR, f"trace_{_RUN_ID}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as fh:
+        json.dump({"created": _RUN_ID, "argv": sys.argv, "spans": _spans}, fh, indent=1)
+    return path
+
+
+def finish():
+    """Write the trace and print the summary table (once per run; also called at exit)."""
+    global _written
+    if not ENABLED or _written or not _spans:
+        return
+    _written = True
+    print(summary(_spans))
+    print(f"Trace saved to {write_trace()}")
+
+
+_T0 = time.perf_counter()
+_RUN_ID = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+if ENABLED:
+    tracemalloc.start()
+    atexit.register(finish)
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1]) as fh:
+        trace = json.load(fh)
+    print(summary(trace["spans"]))
@@ -0,0 +1,81 @@
+# On-demand imports of the heavy plotting and I/O backends.
+#
+# lazy_import("seaborn") returns a stand-in that imports the real module on
+# first attribute access, so a script only pays for seaborn, plotly,
+# wordcloud or geopandas when a figure or layer that needs them is actually
+# produced. Running this module prints a cold-start import report: each entry
+# module is imported in a fresh interpreter and its import time is compared
+# with importing every backend up front.
+#
+#   python lazy.py [MODULE ...]
+
+import importlib
+import json
+import subprocess
+import sys
+
+
+BACKENDS = ("geopandas", "seaborn", "plotly.express", "plotly.graph_objects", "folium", "wordcloud", "scipy.stats")
+ENTRY_MODULES = ("cache", "charts", "render", "emdat", "event_cube", "stats", "pipeline")
+
+
+class LazyModule:
+    """Module stand-in that imports ``name`` on first attribute access."""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        if self._module is None:
+            self.__dict__["_module"] = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    """``name`` if it is already imported, otherwise a LazyModule for it."""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+# ---- Import-time report ----
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    try:
+        __import__(name)
+    except ImportError:
+        pass
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [b for b in {backends!r} if b in sys.modules]}}))
+"""
+
+
+def cold_import(modules, cwd=None):
+    """Seconds to import ``modules`` in a fresh interpreter, and which backends that pulled in."""
+    code = _PROBE.format(modules=list(modules), backends=list(BACKENDS))
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_report(modules=ENTRY_MODULES, cwd=None):
+    """Rows of (module, cold import seconds, backends loaded) plus the all-backends-eager baseline."""
+    rows = [("all backends (eager)", cold_import(BACKENDS, cwd))]
+    rows += [(name, cold_import([name], cwd)) for name in modules]
+    return rows
+
+
+if __name__ == "__main__":
+    import os
+
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'module':<22s} {'import s':>9s}  backends loaded")
+    for name, result in import_report(sys.argv[1:] or ENTRY_MODULES, scripts_dir):
+        print(f"{name:<22s} {result['seconds']:9.2f}  {', '.join(result['loaded']) or '-'}")
@@ -0,0 +1,89 @@
+# Level-of-detail cache for region boundary layers.
+#
+# Each level is a topology-preserving simplification of the whole layer
+# (shapely.coverage_simplify, so neighbouring regions keep a shared edge and
+# no gaps or slivers open up). Tolerances are fractions of the layer extent,
+# so the same levels suit layers in degrees and in metres. Levels are
+# computed once per source and kept in the on-disk cache of cache.py next to
+# the full-resolution layer; a map then loads the coarsest level whose error
+# stays below one output pixel.
+#
+#   python lod.py REGIONS.shp      # vertex counts and load times per level
+
+import sys
+import time
+
+import numpy as np
+import shapely
+
+from cache import CACHE_DIR, read_derived_layer, read_layer
+from reproject import reproject
+
+
+LEVELS = (1 / 20_000, 1 / 5_000, 1 / 1_000, 1 / 200)  # tolerance / larger side of the layer extent
+
+
+def _extent(gdf):
+    minx, miny, maxx, maxy = gdf.total_bounds
+    return max(maxx - minx, maxy - miny)
+
+
+def simplify_layer(gdf, fraction):
+    """Copy of ``gdf`` with its polygons simplified to ``fraction`` of the layer extent."""
+    tolerance = fraction * _extent(gdf)
+    geoms = gdf.geometry.to_numpy()
+    if hasattr(shapely, "coverage_simplify"):  # shapely >= 2.1 with GEOS >= 3.12
+        simplified = shapely.coverage_simplify(geoms, tolerance)
+    else:
+        # Per-polygon fallback: valid shapes, but shared edges may no longer match exactly
+        simplified = shapely.simplify(geoms, tolerance, preserve_topology=True)
+    return gdf.set_geometry(simplified, crs=gdf.crs)
+
+
+def pick_level(width_px):
+    """Coarsest level whose tolerance is below one pixel of a ``width_px`` wide map (None: full detail)."""
+    fine_enough = [fraction for fraction in LEVELS if fraction <= 1 / width_px]
+    return max(fine_enough) if fine_enough else None
+
+
+def read_lod(path, width_px=None, level=None, cache_dir=CACHE_DIR, verbose=False):
+    """Region layer at the level that suits ``width_px`` output pixels (or at ``level`` from LEVELS)."""
+    if level is None:
+        level = pick_level(width_px) if width_px else None
+    if level is None:
+        return read_layer(path, cache_dir, verbose)
+
+    def derive(p):
+        return simplify_layer(read_layer(p, cache_dir), level)
+
+    return read_derived_layer(path, derive, f"lod{round(1 / level)}", cache_dir, verbose)
+
+
+def with_lod_geometry(gdf, path, width_px):
+    """``gdf`` (rows in the order of the layer at ``path``) with the boundaries of the matching level."""
+    layer = read_lod(path, width_px)
+    if gdf.crs is not None:
+        layer = reproject(layer, gdf.crs)
+    return gdf.set_geometry(layer.geometry.to_numpy(), crs=gdf.crs)
+
+
+def figure_width_px(figsize, dpi=150):
+    """Pixel width of a matplotlib figure (render.save writes PNGs at 150 dpi)."""
+    return int(figsize[0] * dpi)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    full = read_layer(path)
+    print(f"{'level':>10s} {'vertices':>10s} {'valid':>6s} {'load s':>8s}")
+    print(f"{'full':>10s} {int(shapely.get_num_coordinates(full.geometry.to_numpy()).sum()):10d}")
+    for fraction in LEVELS:
+        read_lod(path, level=fraction)
+        start = time.perf_counter()
+        layer = read_lod(path, level=fraction)
+        seconds = time.perf_counter() - start
+        geoms = layer.geometry.to_numpy()
+        print(f"{'1/%d' % round(1 / fraction):>10s} {int(shapely.get_num_coordinates(geoms).sum()):10d} "
+              f"{str(bool(np.all(shapely.is_valid(geoms)))):>6s} {seconds:8.4f}")
+    for width in (400, 1500, 4000, 30000):
+        print(f"{width} px wide -> level {pick_level(width)}")
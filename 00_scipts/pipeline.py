@@ -0,0 +1,295 @@
+# Pipeline runner for the numbered scripts.
+#
+# Each stage declares the files it reads and writes. A stage is re-run only
+# when the content hash of one of its inputs (including its own code) differs
+# from the last successful run, or when one of its outputs is missing or was
+# changed outside the pipeline. Because the hashes of upstream outputs are
+# compared, a stage that re-runs but writes identical files does not trigger
+# the stages below it.
+#
+# Usage:
+#   python pipeline.py                 # run whatever is out of date
+#   python pipeline.py --dry-run       # only list the stages that would run
+#   python pipeline.py --force charts_05
+#   python pipeline.py region_table    # run a stage and everything it needs
+#   GEOHEALTH_TRACE=1 python pipeline.py --force region_table   # with timing/memory spans (instrument.py)
+
+import argparse
+import ast
+import json
+import os
+import runpy
+import time
+
+import instrument
+from cache import CACHE_DIR, content_hash, read_layer, source_files, source_stat
+from instrument import span
+
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.path.join(CACHE_DIR, "pipeline_state.json")
+
+# ---- File Paths (same locations as the numbered scripts) ----
+acled_shp = r"\conflict_climate_health\conflict_data\ACLED_original_data\ACLED_Somalia_Fatalities.shp"
+health_facilities_shp = r"\conflict_climate_health\who_health_sites\WHO_health_sites.shp"
+somalia_admin_shp = r"\conflict_climate_health\conflict_data\total_fatalities\00_conflict_total_fatalities.shp"
+events_shp = r"\conflict_climate_health\conflict_data\total_fatalities\Somalia_Regions_with_Events.shp"
+health_events_shp = r"\conflict_climate_health\conflict_data\total_fatalities\Somalia_Regions_with_Health_Events.shp"
+facility_exposure_shp = r"\conflict_climate_health\who_health_sites\WHO_health_sites_exposure.shp"
+
+figures_dir = os.path.join(os.path.dirname(SCRIPTS_DIR), "04_outputs")
+map_tiles_json = os.path.join(os.path.dirname(SCRIPTS_DIR), "04_outputs", "map_tiles", "metadata.json")
+windows_csv = os.path.join(os.path.dirname(SCRIPTS_DIR), "04_outputs", "windows", "region_windows.csv")
+hotspots_csv = os.path.join(os.path.dirname(SCRIPTS_DIR), "04_outputs", "hotspots", "facility_hotspot_exposure.csv")
+hex_cells_csv = os.path.join(os.path.dirname(SCRIPTS_DIR), "04_outputs", "hexgrid", "hex_cells.csv")
+
+
+class Stage:
+    """A named step with declared input and output files."""
+
+    def __init__(self, name, inputs, outputs, run, code=None):
+        self.name = name
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.run = run
+        # Files whose edits should re-run the stage (defaults to this module)
+        self.code = list(code) if code else [os.path.abspath(__file__)]
+
+
+# ---- Stage implementations ----
+def _region_index():
+    from regions import RegionIndex
+    return RegionIndex(read_layer(somalia_admin_shp), name_col="admin1")
+
+
+def _facility_exposure():
+    from accessibility import exposure_table
+    from reproject import layer_xy
+    acled = read_layer(acled_shp, columns=["fatalities"], geometry=False)  # coordinates come from layer_xy
+    table = exposure_table(read_layer(health_facilities_shp), acled,
+                           facility_xy=layer_xy(health_facilities_shp), event_xy=layer_xy(acled_shp))
+    with span("to_file", rows_in=len(table)):
+        table.to_file(facility_exposure_shp)
+
+
+def _map_tiles():
+    from tiles import export_tiles
+    export_tiles(os.path.dirname(map_tiles_json), read_layer(health_facilities_shp), read_layer(acled_shp),
+                 health_events_shp)
+
+
+def _hotspots():
+    from hotspots import hotspot_surfaces
+    from reproject import layer_xy
+    hotspot_surfaces(read_layer(acled_shp, columns=["fatalities"], geometry=False), read_layer(health_facilities_shp),
+                     os.path.dirname(hotspots_csv),
+                     event_xy=layer_xy(acled_shp), facility_xy=layer_xy(health_facilities_shp))
+
+
+def _time_windows():
+    from reproject import layer_xy
+    from windows import window_table
+
+    table = window_table(read_layer(acled_shp, columns=["event_date", "year", "fatalities"]),
+                         read_layer(health_facilities_shp, columns=[]), _region_index(),
+                         event_xy=layer_xy(acled_shp), facility_xy=layer_xy(health_facilities_shp))
+    os.makedirs(os.path.dirname(windows_csv), exist_ok=True)
+    table.to_csv(windows_csv, index=False)
+
+
+def _hex_grid():
+    import pandas as pd
+    from hexgrid import hex_tables
+    from reproject import layer_xy
+
+    tables = hex_tables(read_layer(acled_shp, columns=["fatalities"], geometry=False),
+                        read_layer(health_facilities_shp, columns=[], geometry=False),
+                        event_xy=layer_xy(acled_shp), facility_xy=layer_xy(health_facilities_shp))
+    os.makedirs(os.path.dirname(hex_cells_csv), exist_ok=True)
+    # Cell polygons are rebuilt from the IDs (hexgrid.polygons), so only the attributes are stored
+    pd.concat([pd.DataFrame(t.drop(columns="geometry")) for t in tables.values()]).to_csv(hex_cells_csv, index=False)
+
+
+def _script_inputs(name):
+    """Data files a numbered script reads: its module-level path constants, parsed without running it."""
+    with open(os.path.join(SCRIPTS_DIR, name)) as fh:
+        tree = ast.parse(fh.read())
+    paths = [node.value.value for node in tree.body if isinstance(node, ast.Assign)
+             and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+             and node.value.value.lower().endswith((".shp", ".csv"))]
+    return list(dict.fromkeys(paths))
+
+
+def _script(name, modules=()):
+    path = os.path.join(SCRIPTS_DIR, name)
+
+    def run():
+        # Chart stages save their figures to 04_outputs/ instead of blocking in plt.show()
+        os.environ.setdefault("GEOHEALTH_HEADLESS", "1")
+        runpy.run_path(path, run_name="__main__")
+    return run, [path] + [os.path.join(SCRIPTS_DIR, module) for module in modules]
+
+
+def build_stages():
+    # 02_fatalities.py runs as a script so the pipeline writes the same region tables (streaming and
+    # incremental modes included)
+    region_outputs = [events_shp, health_events_shp]
+    region_run, region_code = _script("02_fatalities.py", ["cache.py", "reproject.py", "regions.py", "dedupe.py",
+                                                            "aggregate.py", "streaming.py", "incremental.py"])
+    stages = [
+        Stage("region_table", [p for p in _script_inputs("02_fatalities.py") if p not in region_outputs],
+              region_outputs, region_run, code=region_code),
+        Stage("facility_exposure", [health_facilities_shp, acled_shp], [facility_exposure_shp], _facility_exposure,
+              code=[__file__, os.path.join(SCRIPTS_DIR, "accessibility.py"), os.path.join(SCRIPTS_DIR, "dedupe.py"),
+                    os.path.join(SCRIPTS_DIR, "reproject.py")]),
+        Stage("map_tiles", [health_facilities_shp, acled_shp, health_events_shp], [map_tiles_json], _map_tiles,
+              code=[__file__, os.path.join(SCRIPTS_DIR, "tiles.py"), os.path.join(SCRIPTS_DIR, "lod.py"),
+                    os.path.join(SCRIPTS_DIR, "reproject.py")]),
+        Stage("hotspots", [acled_shp, health_facilities_shp], [hotspots_csv], _hotspots,
+              code=[__file__, os.path.join(SCRIPTS_DIR, "hotspots.py"),
+                    os.path.join(SCRIPTS_DIR, "reproject.py")]),
+        Stage("time_windows", [acled_shp, health_facilities_shp, somalia_admin_shp], [windows_csv], _time_windows,
+              code=[__file__, os.path.join(SCRIPTS_DIR, "windows.py"), os.path.join(SCRIPTS_DIR, "accessibility.py"),
+                    os.path.join(SCRIPTS_DIR, "regions.py"), os.path.join(SCRIPTS_DIR, "dedupe.py"),
+                    os.path.join(SCRIPTS_DIR, "reproject.py")]),
+        Stage("hex_grid", [acled_shp, health_facilities_shp], [hex_cells_csv], _hex_grid,
+              code=[__file__, os.path.join(SCRIPTS_DIR, "hexgrid.py"), os.path.join(SCRIPTS_DIR, "reproject.py")]),
+    ]
+
+    # ---- Chart families (extra modules they import; outputs: the figures render.show saves, HTML for plotly) ----
+    # Inputs are the paths the scripts themselves declare
+    charts = [
+        ("charts_01", "01_charts.py", ["stats.py"],
+         ["01_conflict_trends", "01_fatalities_distribution", "01_conflict_hotspots", "01_health_vs_conflicts",
+          "01_conflicts_polar"]),
+        ("charts_03", "03_charts_conflicts_health.py", [],
+         ["03_events_fatalities_bars", "03_events_fatalities_stacked", "03_events_bubble_chart.html",
+          "03_events_fatalities_hbar", "03_events_fatalities_hbar_labelled"]),
+        ("charts_04", "04_health_per_region.py", ["lod.py", "stats.py"],
+         ["04_health_facilities_choropleth", "04_fatalities_vs_events", "04_events_vs_facilities",
+          "04_facilities_vs_fatalities", "04_proportional_bar", "04_side_by_side_bars", "04_stacked_bar",
+          "04_correlation_heatmap", "04_pairplot", "04_multi_axis_line", "04_radar_chart"]),
+        ("charts_05", "05_impact_charts.py", [],
+         ["05_conflicts_per_year", "05_disasters_per_year", "05_disaster_heatmap", "05_disaster_trend_lines",
+          "05_disaster_stacked_area", "05_disaster_wordcloud", "05_disaster_sankey.html", "05_disaster_types",
+          "05_disaster_types_set2"]),
+    ]
+    shared = ["charts.py", "render.py", "event_cube.py", "emdat.py"]
+    for name, script, modules, figures in charts:
+        run, code = _script(script, shared + modules)
+        outputs = [os.path.join(figures_dir, f if f.endswith(".html") else f + ".png") for f in figures]
+        stages.append(Stage(name, _script_inputs(script), outputs, run, code=code))
+    return stages
+
+
+# ---- Fingerprints and run state ----
+def _load_state():
+    try:
+        with open(STATE_FILE) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {"stages": {}, "hashes": {}}
+
+
+def _save_state(state):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(state, fh, indent=1)
+    os.replace(tmp, STATE_FILE)
+
+
+def fingerprint(path, state):
+    """Content hash of ``path`` (None if missing); reused while size and mtime are unchanged."""
+    files = source_files(path)
+    if not files:
+        return None
+    key = os.path.abspath(path)
+    stat = source_stat(files)
+    known = state["hashes"].get(key)
+    if known and known["stat"] == stat:
+        return known["hash"]
+    digest = content_hash(files)
+    state["hashes"][key] = {"stat": stat, "hash": digest}
+    return digest
+
+
+def _fingerprints(paths, state):
+    return {os.path.abspath(p): fingerprint(p, state) for p in paths}
+
+
+def is_stale(stage, state):
+    record = state["stages"].get(stage.name)
+    if record is None:
+        return "never run"
+    if record["inputs"] != _fingerprints(stage.inputs + stage.code, state):
+        return "inputs changed"
+    outputs = _fingerprints(stage.outputs, state)
+    if None in outputs.values():
+        return "output missing"
+    if record["outputs"] != outputs:
+        return "output changed"
+    return None
+
+
+def _with_dependencies(stages, targets):
+    """``targets`` plus every stage that produces one of their inputs, in pipeline order."""
+    producers = {os.path.abspath(out): stage for stage in stages for out in stage.outputs}
+    wanted, todo = set(), list(targets)
+    while todo:
+        stage = todo.pop()
+        if stage.name in wanted:
+            continue
+        wanted.add(stage.name)
+        todo.extend(producers[os.path.abspath(p)] for p in stage.inputs if os.path.abspath(p) in producers)
+    return [stage for stage in stages if stage.name in wanted]
+
+
+def run_pipeline(targets=None, force=(), dry_run=False):
+    """Run the out-of-date stages (and the ``force``d ones) needed for ``targets``."""
+    stages = build_stages()
+    if targets:
+        by_name = {stage.name: stage for stage in stages}
+        unknown = [name for name in targets if name not in by_name]
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+        stages = _with_dependencies(stages, [by_name[name] for name in targets])
+
+    state = _load_state()
+    for stage in stages:
+        reason = "forced" if stage.name in force else is_stale(stage, state)
+        if reason is None:
+            print(f"[skip] {stage.name}")
+            continue
+        print(f"[run ] {stage.name} ({reason})")
+        if dry_run:
+            continue
+
+        inputs = _fingerprints(stage.inputs + stage.code, state)
+        start = time.perf_counter()
+        with span(stage.name, stage=True):
+            stage.run()
+        outputs = _fingerprints(stage.outputs, state)
+        missing = [path for path, digest in outputs.items() if digest is None]
+        if missing:
+            # Not recorded, so the stage runs again next time
+            raise RuntimeError(f"Stage {stage.name} did not write: {', '.join(missing)}")
+        state["stages"][stage.name] = {
+            "inputs": inputs,
+            "outputs": outputs,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        _save_state(state)
+        print(f"       {stage.name} finished in {state['stages'][stage.name]['seconds']:.2f} s")
+    _save_state(state)
+    # Stage spans and the steps inside them, when GEOHEALTH_TRACE is set
+    instrument.finish()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the out-of-date stages of the GeoHealth pipeline.")
+    parser.add_argument("stages", nargs="*", help="stages to bring up to date (default: all)")
+    parser.add_argument("--force", nargs="*", default=[], help="stages to re-run even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="list the stages that would run")
+    args = parser.parse_args()
+    run_pipeline(args.stages, force=set(args.force), dry_run=args.dry_run)
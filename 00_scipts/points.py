@@ -0,0 +1,80 @@
+# Shared geometry builder for the point layers (WHO health sites, ACLED events).
+# Point geometries are created from the lat/long columns in one bulk call
+# instead of a row-wise DataFrame.apply(lambda row: Point(...)).
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from pyproj import CRS
+from shapely.geometry import Point
+
+
+# ---- Column names used by the source layers ----
+HEALTH_COORDS = ("Long", "Lat")
+ACLED_COORDS = ("longitude", "latitude")
+ACLED_CRS = "EPSG:4326"
+
+
+def build_points(df, x_col, y_col, crs="EPSG:4326", verbose=True):
+    """Return a GeoDataFrame whose geometry is built from ``x_col``/``y_col``.
+
+    Coordinates are coerced to float in bulk. Rows with missing, non-numeric,
+    non-finite or out-of-range coordinates are dropped and the number of
+    dropped rows is reported.
+    """
+    x = pd.to_numeric(df[x_col], errors="coerce").to_numpy(dtype="float64")
+    y = pd.to_numeric(df[y_col], errors="coerce").to_numpy(dtype="float64")
+
+    valid = np.isfinite(x) & np.isfinite(y)
+    if crs is not None and CRS.from_user_input(crs).is_geographic:
+        valid &= (np.abs(x) <= 180) & (np.abs(y) <= 90)
+
+    dropped = int(len(valid) - valid.sum())
+    if verbose and dropped:
+        print(f"build_points: dropped {dropped} of {len(df)} rows with invalid {x_col}/{y_col}")
+
+    # Any existing geometry column is replaced by the rebuilt points
+    data = pd.DataFrame(df).drop(columns="geometry", errors="ignore")
+    if dropped:
+        data = data.loc[valid]
+        x, y = x[valid], y[valid]
+
+    return gpd.GeoDataFrame(data, geometry=gpd.points_from_xy(x, y), crs=crs)
+
+
+# ---- Benchmark against the row-wise apply path ----
+def _apply_points(df, x_col, y_col):
+    return df.apply(lambda row: Point(float(row[x_col]), float(row[y_col])), axis=1)
+
+
+def benchmark(n=200_000, seed=0):
+    """Time ``build_points`` against the row-wise ``apply`` path on ``n`` synthetic events."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "longitude": rng.uniform(41.0, 51.5, n),
+        "latitude": rng.uniform(-1.7, 12.0, n),
+        "fatalities": rng.integers(0, 10, n),
+    })
+
+    start = time.perf_counter()
+    applied = _apply_points(df, *ACLED_COORDS)
+    apply_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    built = build_points(df, *ACLED_COORDS)
+    bulk_time = time.perf_counter() - start
+
+    assert shapely.equals_exact(applied.to_numpy(), built.geometry.to_numpy(), 0).all()
+
+    print(f"Rows: {n}")
+    print(f"apply(Point(...)): {apply_time:.3f} s")
+    print(f"build_points:      {bulk_time:.3f} s  ({apply_time / bulk_time:.0f}x faster)")
+    return apply_time, bulk_time
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
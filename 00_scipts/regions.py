@@ -0,0 +1,101 @@
+# Region assignment engine shared by the scripts that attach points to the
+# Somali admin1 regions (replaces gpd.sjoin(points, admin, predicate="within")).
+#
+# The region polygons are indexed once: a packed STRtree over the prepared
+# polygons plus a regular lookup grid over their extent. Grid cells that lie
+# completely inside one region (or outside all regions) answer a point by
+# arithmetic alone; only points in cells crossed by a region border are tested
+# against the exact polygons, once per unique coordinate (dedupe.Locations).
+
+import numpy as np
+import shapely
+
+from dedupe import Locations
+from instrument import span
+from reproject import points_xy
+
+
+OUTSIDE = -1  # code of points that fall in no region
+_BORDER = -2  # grid cell that needs the exact polygon test
+
+
+class RegionIndex:
+    """Point-in-region lookup returning integer region codes.
+
+    Codes index into ``names`` (and the rows of the region layer);
+    points outside every region get ``OUTSIDE``.
+    """
+
+    def __init__(self, regions_gdf, name_col="admin1", grid_size=256):
+        self.crs = regions_gdf.crs
+        self.names = regions_gdf[name_col].to_numpy()
+        self.geoms = regions_gdf.geometry.to_numpy()
+        self.dtype = np.int16 if len(self.geoms) < np.iinfo(np.int16).max else np.int32
+
+        shapely.prepare(self.geoms)
+        self.tree = shapely.STRtree(self.geoms)
+
+        # ---- Lookup grid over the region extent ----
+        self.minx, self.miny, maxx, maxy = regions_gdf.total_bounds
+        self.nx = self.ny = grid_size
+        self.dx = (maxx - self.minx) / self.nx
+        self.dy = (maxy - self.miny) / self.ny
+
+        col, row = np.meshgrid(np.arange(self.nx), np.arange(self.ny))
+        x0 = self.minx + col.ravel() * self.dx
+        y0 = self.miny + row.ravel() * self.dy
+        cells = shapely.box(x0, y0, x0 + self.dx, y0 + self.dy)
+
+        # A cell not crossed by any region boundary lies wholly inside one
+        # region (or outside all of them), so its centre decides the code.
+        edges = shapely.STRtree(shapely.boundary(self.geoms))
+        border, _ = edges.query(cells, predicate="intersects")
+        self.cell_code = self._exact(x0 + self.dx / 2, y0 + self.dy / 2)
+        self.cell_code[border] = _BORDER
+
+    def __len__(self):
+        return len(self.names)
+
+    def assign_xy(self, x, y):
+        """Return the region code of every (x, y) coordinate pair."""
+        x = np.asarray(x, dtype="float64")
+        y = np.asarray(y, dtype="float64")
+        codes = np.full(x.shape, OUTSIDE, dtype=self.dtype)
+
+        # ---- Grid pre-filter ----
+        col = np.floor((x - self.minx) / self.dx)
+        row = np.floor((y - self.miny) / self.dy)
+        on_grid = (col >= 0) & (col < self.nx) & (row >= 0) & (row < self.ny)
+        cell = (row[on_grid] * self.nx + col[on_grid]).astype(np.int64)
+        codes[on_grid] = self.cell_code[cell]
+
+        # ---- Exact test only for points near a region border, once per location ----
+        border = np.flatnonzero(codes == _BORDER)
+        if border.size:
+            locations = Locations.from_xy(x[border], y[border])
+            codes[border] = locations.broadcast(self._exact(locations.x, locations.y))
+        return codes
+
+    def _exact(self, x, y):
+        """Exact point-in-polygon test, limited to the regions whose bbox holds each point."""
+        codes = np.full(x.shape, OUTSIDE, dtype=self.dtype)
+        hit, region = self.tree.query(shapely.points(x, y))
+        # Regions are tested in reverse order so the first one wins on a shared edge
+        for r in np.unique(region)[::-1]:
+            candidates = hit[region == r]
+            inside = shapely.contains_xy(self.geoms[r], x[candidates], y[candidates])
+            codes[candidates[inside]] = r
+        return codes
+
+    def assign(self, points_gdf):
+        """Return the region code of every point in ``points_gdf``."""
+        with span("region_assign", rows_in=len(points_gdf)) as s:
+            crs = self.crs if points_gdf.crs is not None else None
+            codes = self.assign_xy(*points_xy(points_gdf, crs))
+            s.rows_out = int((codes != OUTSIDE).sum())
+        return codes
+
+    def labels(self, codes):
+        """Map region codes to region names (None for points outside all regions)."""
+        names = np.append(self.names.astype(object), None)
+        return names[np.where(codes == OUTSIDE, len(self.names), codes)]
@@ -0,0 +1,154 @@
+# Headless batch rendering of the chart figures.
+#
+# Set GEOHEALTH_HEADLESS=1 to run the chart scripts without a display:
+# show() then saves each figure to 04_outputs/ (Agg backend) instead of
+# blocking in plt.show(). Running this module renders every chart of the
+# 03_, 04_ and 05_ scripts over a process pool and prints per-figure timings:
+#
+#   python render.py [--workers N] [--out DIR]
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+HEADLESS = os.environ.get("GEOHEALTH_HEADLESS", "") not in ("", "0")
+if HEADLESS:
+    matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402  (backend must be chosen first)
+
+from cache import OUTPUT_DIR  # noqa: E402
+from instrument import span  # noqa: E402
+
+
+def save(fig, name, out_dir=OUTPUT_DIR, dpi=150):
+    """Write ``fig`` to ``out_dir`` (PNG, or HTML for plotly figures), free it and return the path."""
+    os.makedirs(out_dir, exist_ok=True)
+    with span("render", figure=name):
+        if hasattr(fig, "write_html"):
+            path = os.path.join(out_dir, f"{name}.html")
+            fig.write_html(path, include_plotlyjs="cdn")
+        else:
+            path = os.path.join(out_dir, f"{name}.png")
+            fig.savefig(path, dpi=dpi, bbox_inches="tight")
+            plt.close(fig)
+    return path
+
+
+def show(fig, name):
+    """Display ``fig``, or save it to 04_outputs/ when running headless."""
+    if HEADLESS:
+        print(f"Saved {save(fig, name)}")
+    elif hasattr(fig, "write_html"):
+        fig.show()
+    else:
+        plt.show()
+
+
+# ---- Process pool ----
+def _init_worker():
+    matplotlib.use("Agg")
+
+
+def _render(job):
+    name, builder, args, kwargs, out_dir = job
+    import charts
+
+    start = time.perf_counter()
+    path = save(getattr(charts, builder)(*args, **kwargs), name, out_dir)
+    return path, time.perf_counter() - start
+
+
+def render_all(jobs, out_dir=OUTPUT_DIR, workers=None):
+    """Render ``(name, charts_function_name, args, kwargs)`` jobs over a process pool.
+
+    Each worker uses the Agg backend and closes every figure after saving,
+    so memory stays flat however many figures are rendered. A failing figure
+    is reported and does not stop the others.
+    """
+    start = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_render, job + (out_dir,)): job[0] for job in jobs}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                path, seconds = future.result()
+            except Exception as exc:
+                print(f"  failed    {name}: {exc!r}")
+                continue
+            print(f"{seconds:8.2f} s  {os.path.basename(path)}")
+            results[name] = (path, seconds)
+    print(f"Rendered {len(results)} of {len(jobs)} figures in {time.perf_counter() - start:.2f} s")
+    return results
+
+
+# ---- Figures of the chart scripts ----
+events_shp = r"\conflict_climate_health\conflict_data\total_fatalities\Somalia_Regions_with_Events.shp"
+health_events_shp = r"\conflict_climate_health\conflict_data\total_fatalities\Somalia_Regions_with_Health_Events.shp"
+conflict_data_path = r"\conflict_climate_health\ACLED\ACLED_Somalia_Fatalities.shp"
+emdat_data_path = r"\conflict_climate_health\conflict_data\emdat.csv"
+
+
+def chart_jobs():
+    """Load the chart inputs once and list every figure of 03_, 04_ and 05_."""
+    import pandas as pd
+    import charts
+    from cache import read_layer
+    from emdat import load_emdat
+    from event_cube import cached_cube
+    from lod import figure_width_px, with_lod_geometry
+
+    events = read_layer(events_shp, geometry=False)
+    gdf = read_layer(health_events_shp)
+    df = pd.DataFrame(gdf[["admin1", "fatalities", "event_coun", "health_fac"]]).rename(
+        columns={"health_fac": "health_facilities"})
+    conflicts = cached_cube(conflict_data_path).yearly()
+    df_emdat = load_emdat(emdat_data_path)
+    matrix = charts.disaster_matrix(df_emdat)
+    types = charts.disaster_type_counts(df_emdat)
+
+    return [
+        # 03_charts_conflicts_health.py
+        ("03_events_fatalities_bars", "events_fatalities_bars", (events,), {}),
+        ("03_events_fatalities_stacked", "events_fatalities_stacked", (events,), {}),
+        ("03_events_bubble_chart", "events_bubble_chart", (events,), {}),
+        ("03_events_fatalities_hbar", "events_fatalities_hbar", (events,), {}),
+        ("03_events_fatalities_hbar_labelled", "events_fatalities_hbar", (events,),
+         {"labels": {"event_coun": "Number of Events", "fatalities": "Fatalities"}}),
+        # 04_health_per_region.py
+        ("04_health_facilities_choropleth", "health_facilities_choropleth",
+         (with_lod_geometry(gdf, health_events_shp, figure_width_px((10, 8))),), {}),
+        ("04_fatalities_vs_events", "fatalities_vs_events_bar", (df,), {}),
+        ("04_events_vs_facilities", "events_vs_facilities_scatter", (df,), {"facilities": "health_facilities"}),
+        ("04_facilities_vs_fatalities", "facilities_vs_fatalities_bubble", (df,), {"facilities": "health_facilities"}),
+        ("04_proportional_bar", "proportional_bar", (df,), {}),
+        ("04_side_by_side_bars", "side_by_side_bars", (df,), {}),
+        ("04_stacked_bar", "stacked_bar", (df,), {}),
+        ("04_correlation_heatmap", "correlation_heatmap", (df,), {}),
+        ("04_pairplot", "pairplot", (df,), {}),
+        ("04_multi_axis_line", "multi_axis_line", (df,), {}),
+        ("04_radar_chart", "radar_chart", (df,), {}),
+        # 05_impact_charts.py
+        ("05_conflicts_per_year", "conflicts_per_year_bar", (conflicts,), {}),
+        ("05_disasters_per_year", "disasters_per_year_bar", (charts.year_counts(charts.emdat_years(df_emdat)),), {}),
+        ("05_disaster_heatmap", "disaster_heatmap", (matrix,), {}),
+        ("05_disaster_trend_lines", "disaster_trend_lines", (matrix,), {}),
+        ("05_disaster_stacked_area", "disaster_stacked_area", (matrix,), {}),
+        ("05_disaster_wordcloud", "disaster_wordcloud", (df_emdat["Disaster Type"],), {}),
+        ("05_disaster_sankey", "disaster_sankey", (matrix,), {}),
+        ("05_disaster_types", "disaster_types_bar", (types,), {}),
+        ("05_disaster_types_set2", "disaster_types_bar", (types,),
+         {"palette": "Set2", "ylabel": "Disaster Records", "title": "Disaster Types in Somalia (EMDAT Database)"}),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render every chart figure headlessly to 04_outputs/.")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--out", default=OUTPUT_DIR, help="output directory")
+    args = parser.parse_args()
+    render_all(chart_jobs(), out_dir=args.out, workers=args.workers)
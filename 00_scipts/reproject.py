@@ -0,0 +1,128 @@
+# CRS reprojection shared by the scripts and modules.
+#
+# reproject() is a drop-in for GeoDataFrame.to_crs that returns a copy with
+# unmoved coordinates when the target CRS is the same or the transform between
+# the two is a no-op (e.g. the 3-D WGS 84 CRS of the region layer and
+# EPSG:4326). Otherwise all coordinates (Z included) are transformed in bulk
+# with a pyproj Transformer that is built once per CRS pair and reused. layer_xy() returns
+# the point coordinates of a layer file in a given CRS and keeps them in the
+# on-disk cache of cache.py, so unchanged layers are never transformed again.
+#
+#   python reproject.py LAYER.shp [EPSG:20538]   # compare with to_crs, cold and warm sidecar loads
+
+import functools
+import hashlib
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+from pyproj import CRS, Transformer
+
+from cache import CACHE_DIR, read_layer, read_table
+from instrument import span
+
+
+METRIC_CRS = "EPSG:20538"  # Afgooye / UTM zone 38N, metres (Somalia)
+
+
+@functools.lru_cache(maxsize=32)
+def _transformer(src_wkt, dst_wkt):
+    return Transformer.from_crs(CRS.from_wkt(src_wkt), CRS.from_wkt(dst_wkt), always_xy=True)
+
+
+def transformer(src, dst):
+    """Cached (x, y)-ordered Transformer from ``src`` to ``dst``, or None when no transform is needed."""
+    if src is None or dst is None:
+        return None
+    src, dst = CRS.from_user_input(src), CRS.from_user_input(dst)
+    if src == dst:
+        return None
+    t = _transformer(src.to_wkt(), dst.to_wkt())
+    return None if t.name == "noop" else t
+
+
+def transform_xy(x, y, src, dst):
+    """``x``/``y`` arrays in ``dst`` (the inputs themselves when no transform is needed)."""
+    t = transformer(src, dst)
+    if t is None:
+        return np.asarray(x, dtype="float64"), np.asarray(y, dtype="float64")
+    return t.transform(np.asarray(x, dtype="float64"), np.asarray(y, dtype="float64"))
+
+
+def points_xy(gdf, crs=None):
+    """x/y arrays of a point layer, in ``crs`` when given."""
+    geoms = gdf.geometry.to_numpy()
+    x, y = shapely.get_x(geoms), shapely.get_y(geoms)
+    return transform_xy(x, y, gdf.crs, crs) if crs is not None else (x, y)
+
+
+def reproject(gdf, crs):
+    """``gdf.to_crs(crs)`` (a new layer, Z values kept), skipped when it would not move any coordinate."""
+    if gdf.crs is None:
+        return gdf.to_crs(crs)  # same error as to_crs for a layer without CRS
+    if gdf.crs == CRS.from_user_input(crs):
+        return gdf.copy()
+    t = transformer(gdf.crs, crs)
+    if t is None:
+        # Equivalent CRS (e.g. 3-D and 2-D WGS 84): relabel only
+        return gdf.set_crs(crs, allow_override=True)
+    with span("to_crs", rows_in=len(gdf), crs=str(crs)):
+        geoms = gdf.geometry.to_numpy()
+        moved = geoms.copy()
+        # One transform over every vertex of every geometry (points, lines and polygons alike);
+        # geometries with Z get their Z transformed too, as in to_crs
+        for has_z in (False, True):
+            subset = shapely.has_z(geoms) == has_z
+            if subset.any():
+                moved[subset] = shapely.transform(geoms[subset], lambda coords: np.column_stack(
+                    t.transform(*coords.T)), include_z=has_z)
+        return gdf.set_geometry(moved, crs=crs)
+
+
+# ---- Cached coordinate sidecars ----
+def _crs_tag(crs):
+    crs = CRS.from_user_input(crs)
+    epsg = crs.to_epsg()
+    if epsg:
+        return f"epsg{epsg}"
+    return hashlib.sha1(crs.to_wkt().encode()).hexdigest()[:12]
+
+
+def layer_xy(path, crs=METRIC_CRS, cache_dir=CACHE_DIR, verbose=False):
+    """(n, 2) point coordinates of the layer at ``path`` in ``crs``, from the on-disk cache when unchanged."""
+    def parse(p):
+        x, y = points_xy(read_layer(p, cache_dir), crs)
+        return pd.DataFrame({"x": x, "y": y})
+
+    table = read_table(path, parse, f"xy-{_crs_tag(crs)}", cache_dir, verbose)
+    return np.column_stack([table["x"].to_numpy(), table["y"].to_numpy()])
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    crs = sys.argv[2] if len(sys.argv) > 2 else METRIC_CRS
+    gdf = read_layer(path)
+
+    start = time.perf_counter()
+    expected = gdf.to_crs(crs)
+    to_crs_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    got = reproject(gdf, crs)
+    reproject_s = time.perf_counter() - start
+
+    same = reproject(gdf, gdf.crs)
+    print(f"to_crs: {to_crs_s:.4f} s, reproject: {reproject_s:.4f} s, same layer CRS gives an unmoved copy: "
+          f"{same is not gdf and same.geometry.equals(gdf.geometry)}")
+    print("Geometries match:", bool(np.all(shapely.equals_exact(got.geometry.to_numpy(),
+                                                                 expected.geometry.to_numpy(), 1e-6))))
+
+    if np.all(shapely.get_type_id(gdf.geometry.to_numpy()) == 0):
+        for kind in ("cold/warm", "warm"):
+            start = time.perf_counter()
+            xy = layer_xy(path, crs, verbose=True)
+            print(f"layer_xy ({kind}): {time.perf_counter() - start:.4f} s")
+        ex = np.column_stack([shapely.get_x(expected.geometry.to_numpy()), shapely.get_y(expected.geometry.to_numpy())])
+        print("Sidecar matches to_crs:", np.allclose(xy, ex, equal_nan=True))
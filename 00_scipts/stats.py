@@ -0,0 +1,165 @@
+# Correlation and regression statistics with resampling uncertainty for the
+# region (and district or grid) tables.
+#
+# Pearson and Spearman correlations and a least-squares line are reported
+# with percentile bootstrap confidence intervals and two-sided permutation
+# p-values. Resamples are drawn as one (resamples x n) index matrix and the
+# statistics are computed for all rows at once with array operations, in
+# batches that keep that matrix at a bounded size. Results depend only on
+# ``seed``.
+#
+#   python stats.py TABLE.shp|TABLE.csv COLUMN [COLUMN ...] [--resamples 10000]
+
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+
+N_RESAMPLES = 10_000
+MAX_BATCH_CELLS = 4_000_000  # resamples x n values per batch
+
+
+# ---- Batched statistics (one value per row) ----
+def _pearson_rows(x, y):
+    xc = x - x.mean(axis=1, keepdims=True)
+    yc = y - y.mean(axis=1, keepdims=True)
+    denom = np.sqrt((xc * xc).sum(axis=1) * (yc * yc).sum(axis=1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (xc * yc).sum(axis=1) / denom
+
+
+def _line_rows(x, y):
+    """Slope, intercept and R² of the least-squares line of every row."""
+    xm, ym = x.mean(axis=1, keepdims=True), y.mean(axis=1, keepdims=True)
+    xc, yc = x - xm, y - ym
+    sxx, syy, sxy = (xc * xc).sum(axis=1), (yc * yc).sum(axis=1), (xc * yc).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = sxy / sxx
+        r2 = sxy * sxy / (sxx * syy)
+    return slope, ym[:, 0] - slope * xm[:, 0], r2
+
+
+def _resampled_ranks(codes, n_values, idx):
+    """Average (tie-aware) ranks within every resample row, without sorting.
+
+    ``codes`` are the dense value ranks of the data (np.unique inverse); per
+    row, the draws of each value are counted with one bincount and a
+    cumulative sum gives the number of smaller draws.
+    """
+    size = idx.shape[0]
+    drawn = codes[idx]
+    keys = (np.arange(size)[:, None] * n_values + drawn).ravel()
+    counts = np.bincount(keys, minlength=size * n_values).reshape(size, n_values)
+    ranks = np.cumsum(counts, axis=1) - (counts - 1) / 2.0
+    return np.take_along_axis(ranks, drawn, axis=1)
+
+
+def _batches(n_resamples, n):
+    size = max(1, MAX_BATCH_CELLS // max(n, 1))
+    for start in range(0, n_resamples, size):
+        yield min(size, n_resamples - start)
+
+
+def _clean(x, y):
+    x = np.asarray(pd.to_numeric(pd.Series(np.asarray(x)), errors="coerce"), dtype="float64")
+    y = np.asarray(pd.to_numeric(pd.Series(np.asarray(y)), errors="coerce"), dtype="float64")
+    keep = np.isfinite(x) & np.isfinite(y)
+    return x[keep], y[keep]
+
+
+def bootstrap(n, statistic, n_resamples=N_RESAMPLES, rng=None):
+    """``statistic(idx)`` for ``n_resamples`` rows of bootstrap indices (n draws with replacement each)."""
+    rng = np.random.default_rng(rng)
+    return np.concatenate([statistic(rng.integers(0, n, size=(size, n))) for size in _batches(n_resamples, n)])
+
+
+def permutations(x, y, statistic, n_resamples=N_RESAMPLES, rng=None):
+    """``statistic`` of ``x`` against shuffled ``y``, ``n_resamples`` times (the null distribution)."""
+    rng = np.random.default_rng(rng)
+    n = len(x)
+    out = []
+    for size in _batches(n_resamples, n):
+        idx = rng.permuted(np.broadcast_to(np.arange(n), (size, n)), axis=1)
+        out.append(statistic(np.broadcast_to(x, (size, n)), y[idx]))
+    return np.concatenate(out)
+
+
+def _summary(estimate, boot, null, ci):
+    alpha = (1 - ci) / 2
+    boot = boot[np.isfinite(boot)]
+    low, high = np.quantile(boot, [alpha, 1 - alpha]) if len(boot) else (np.nan, np.nan)
+    null = null[np.isfinite(null)]
+    # Two-sided permutation p-value, counting the observed arrangement
+    p = (np.sum(np.abs(null) >= abs(estimate) - 1e-12) + 1) / (len(null) + 1) if len(null) else np.nan
+    return {"estimate": estimate, "ci_low": low, "ci_high": high, "p_perm": p}
+
+
+# ---- Public API ----
+def correlation(x, y, method="pearson", n_resamples=N_RESAMPLES, ci=0.95, seed=0):
+    """Correlation of ``x`` and ``y`` with a bootstrap CI and a permutation p-value."""
+    x, y = _clean(x, y)
+    rng = np.random.default_rng(seed)
+    if method == "pearson":
+        boot = bootstrap(len(x), lambda idx: _pearson_rows(x[idx], y[idx]), n_resamples, rng)
+    elif method == "spearman":
+        # Resamples are re-ranked from value counts; permutations only shuffle the fixed ranks
+        (vx, cx), (vy, cy) = (np.unique(v, return_inverse=True) for v in (x, y))
+        boot = bootstrap(len(x), lambda idx: _pearson_rows(_resampled_ranks(cx, len(vx), idx),
+                                                           _resampled_ranks(cy, len(vy), idx)), n_resamples, rng)
+        from scipy.stats import rankdata
+        x, y = rankdata(x), rankdata(y)
+    else:
+        raise ValueError(f"Unknown correlation method: {method}")
+    estimate = float(_pearson_rows(x[None], y[None])[0])
+    null = permutations(x, y, _pearson_rows, n_resamples, rng)
+    return {"method": method, "n": len(x), **_summary(estimate, boot, null, ci)}
+
+
+def regression(x, y, n_resamples=N_RESAMPLES, ci=0.95, seed=0):
+    """Least-squares line of ``y`` on ``x`` with bootstrap CIs (slope, intercept, R²) and a permutation p for the slope."""
+    x, y = _clean(x, y)
+    slope, intercept, r2 = (float(v[0]) for v in _line_rows(x[None], y[None]))
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    boot = bootstrap(n, lambda idx: np.column_stack(_line_rows(x[idx], y[idx])), n_resamples, rng)
+    null = permutations(x, y, lambda a, b: _line_rows(a, b)[0], n_resamples, rng)
+
+    rows = []
+    for i, (term, estimate) in enumerate((("slope", slope), ("intercept", intercept), ("r2", r2))):
+        summary = _summary(estimate, boot[:, i], null if term == "slope" else np.array([]), ci)
+        rows.append({"term": term, "n": n, **summary})
+    return pd.DataFrame(rows)
+
+
+def correlation_table(df, columns, methods=("pearson", "spearman"), n_resamples=N_RESAMPLES, ci=0.95, seed=0):
+    """Every column pair and method as one row of (estimate, CI, permutation p)."""
+    rows = []
+    for a, b in itertools.combinations(columns, 2):
+        for method in methods:
+            rows.append({"x": a, "y": b, **correlation(df[a], df[b], method, n_resamples, ci, seed)})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Correlations and regression with bootstrap/permutation intervals.")
+    parser.add_argument("table", help="shapefile or CSV")
+    parser.add_argument("columns", nargs="+")
+    parser.add_argument("--resamples", type=int, default=N_RESAMPLES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.table.lower().endswith(".csv"):
+        table = pd.read_csv(args.table)
+    else:
+        from cache import read_layer
+        table = read_layer(args.table)
+
+    start = time.perf_counter()
+    pd.set_option("display.width", 160)
+    print(correlation_table(table, args.columns, n_resamples=args.resamples, seed=args.seed))
+    print(regression(table[args.columns[0]], table[args.columns[1]], n_resamples=args.resamples, seed=args.seed))
+    print(f"{args.resamples} resamples per statistic in {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,170 @@
+# Streaming ACLED ingestion for national-scale or multi-country event files.
+#
+# The ACLED source (shapefile or CSV export) is read in bounded chunks. Each
+# chunk is assigned to regions and folded into per-region and per-year
+# accumulators, then dropped, so peak memory depends on the chunk size and
+# not on the size of the file. The final table has the same columns as the
+# one written by 02_fatalities.py.
+#
+#   python streaming.py ACLED.shp|ACLED.csv REGIONS.shp [WHO_health_sites.shp] [--chunksize N]
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+from aggregate import bincount, region_table
+from points import ACLED_COORDS, ACLED_CRS
+from reproject import points_xy, transform_xy
+
+
+def iter_chunks(path, chunksize=100_000, columns=None):
+    """Yield successive chunks of at most ``chunksize`` rows from a shapefile or CSV."""
+    if os.path.splitext(path)[1].lower() == ".csv":
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=columns)
+        return
+
+    start = 0
+    while True:
+        chunk = gpd.read_file(path, rows=slice(start, start + chunksize), columns=columns)
+        if chunk.empty:
+            return
+        yield chunk
+        start += len(chunk)
+
+
+def _coordinates(chunk, crs):
+    """x/y arrays of a chunk in ``crs``, taken from its geometry or from the ACLED lat/long columns."""
+    if isinstance(chunk, gpd.GeoDataFrame):
+        return points_xy(chunk, crs if chunk.crs is not None else None)
+    x_col, y_col = ACLED_COORDS
+    x = pd.to_numeric(chunk[x_col], errors="coerce").to_numpy(dtype="float64")
+    y = pd.to_numeric(chunk[y_col], errors="coerce").to_numpy(dtype="float64")
+    # ACLED longitude/latitude are WGS 84 (a no-op when the regions are too)
+    return transform_xy(x, y, ACLED_CRS, crs) if crs is not None else (x, y)
+
+
+def _years(chunk):
+    if "year" in chunk.columns:
+        return pd.to_numeric(chunk["year"], errors="coerce").fillna(-1).to_numpy(dtype=np.int64)
+    if "event_date" in chunk.columns:
+        return pd.to_datetime(chunk["event_date"], errors="coerce").dt.year.fillna(-1).to_numpy(dtype=np.int64)
+    return np.full(len(chunk), -1, dtype=np.int64)
+
+
+class RegionYearAccumulator:
+    """Running event counts and fatality sums per region and per (region, year)."""
+
+    def __init__(self, n_regions):
+        self.n_regions = n_regions
+        self.events = np.zeros(n_regions, dtype=np.int64)
+        self.fatalities = np.zeros(n_regions, dtype=np.int64)
+        self.by_year = {}  # year -> (events, fatalities) arrays of length n_regions
+        self.rows = 0
+        self.has_fatalities = False
+
+    def add(self, codes, years, fatalities=None):
+        self.rows += len(codes)
+        self.events += bincount(codes, self.n_regions)
+        if fatalities is not None:
+            self.has_fatalities = True
+            self.fatalities += bincount(codes, self.n_regions, fatalities).astype(np.int64)
+
+        # One bincount over (year, region) keys per chunk
+        inside = codes >= 0
+        uniq, year_idx = np.unique(years[inside], return_inverse=True)
+        keys = year_idx * self.n_regions + codes[inside]
+        size = len(uniq) * self.n_regions
+        events = np.bincount(keys, minlength=size).reshape(len(uniq), self.n_regions)
+        if fatalities is not None:
+            weights = np.nan_to_num(np.asarray(pd.to_numeric(fatalities, errors="coerce"), dtype="float64")[inside])
+            deaths = np.bincount(keys, weights=weights, minlength=size).reshape(len(uniq), self.n_regions)
+        else:
+            deaths = np.zeros_like(events)
+        for i, year in enumerate(uniq.tolist()):
+            year_events, year_deaths = self.by_year.setdefault(
+                year, (np.zeros(self.n_regions, dtype=np.int64), np.zeros(self.n_regions, dtype=np.int64)))
+            year_events += events[i]
+            year_deaths += deaths[i].astype(np.int64)
+
+    def year_table(self, names):
+        """Long (year, region, event_count, fatalities) table."""
+        years = sorted(self.by_year)
+        return pd.DataFrame({
+            "year": np.repeat(years, self.n_regions),
+            "admin1": np.tile(names, len(years)),
+            "event_count": np.concatenate([self.by_year[y][0] for y in years]) if years else [],
+            "fatalities": np.concatenate([self.by_year[y][1] for y in years]) if years else [],
+        })
+
+
+def stream_events(acled_path, region_index, chunksize=100_000, verbose=True):
+    """Stream an ACLED file through ``region_index`` and return the filled accumulator."""
+    acc = RegionYearAccumulator(len(region_index))
+    start = time.perf_counter()
+    for chunk in iter_chunks(acled_path, chunksize):
+        codes = region_index.assign_xy(*_coordinates(chunk, region_index.crs))
+        fatalities = chunk["fatalities"] if "fatalities" in chunk.columns else None
+        acc.add(codes, _years(chunk), fatalities)
+        if verbose:
+            print(f"stream_events: {acc.rows} rows ({time.perf_counter() - start:.1f} s)")
+    return acc
+
+
+def stream_region_table(acled_path, regions_gdf, health_gdf=None, chunksize=100_000, name_col="admin1", verbose=True):
+    """Region table of 02_fatalities.py built from a streamed ACLED source."""
+    from regions import RegionIndex
+
+    region_index = RegionIndex(regions_gdf, name_col=name_col)
+    acc = stream_events(acled_path, region_index, chunksize, verbose)
+
+    layers = {}
+    if health_gdf is not None:
+        layers["health_facilities"] = region_index.assign(health_gdf)
+    table = region_table(regions_gdf, layers)
+    table["event_count"] = acc.events
+    if acc.has_fatalities:
+        table["fatalities"] = acc.fatalities
+    return table, acc.year_table(region_index.names)
+
+
+def in_memory_region_table(acled_path, regions_gdf, health_gdf=None, name_col="admin1"):
+    """The all-in-memory path of 02_fatalities.py, for comparison."""
+    from regions import RegionIndex
+
+    acled = gpd.read_file(acled_path) if not acled_path.lower().endswith(".csv") else pd.read_csv(acled_path)
+    region_index = RegionIndex(regions_gdf, name_col=name_col)
+    codes = region_index.assign_xy(*_coordinates(acled, region_index.crs))
+    layers = {"event_count": codes}
+    if health_gdf is not None:
+        layers["health_facilities"] = region_index.assign(health_gdf)
+    if "fatalities" in acled.columns:
+        layers["fatalities"] = (codes, acled["fatalities"])
+    return region_table(regions_gdf, layers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream an ACLED file into the region table and check it.")
+    parser.add_argument("acled")
+    parser.add_argument("regions")
+    parser.add_argument("health", nargs="?")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    regions_gdf = gpd.read_file(args.regions)
+    health_gdf = gpd.read_file(args.health) if args.health else None
+
+    start = time.perf_counter()
+    streamed, per_year = stream_region_table(args.acled, regions_gdf, health_gdf, args.chunksize)
+    print(f"Streamed in {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    expected = in_memory_region_table(args.acled, regions_gdf, health_gdf)
+    print(f"In memory in {time.perf_counter() - start:.2f} s")
+
+    columns = [c for c in ("event_count", "fatalities", "health_facilities") if c in expected.columns]
+    same = all(np.array_equal(streamed[c].to_numpy(), expected[c].to_numpy()) for c in columns)
+    print(streamed[["admin1"] + columns])
+    print("Matches the in-memory path:", same)
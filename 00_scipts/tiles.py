@@ -0,0 +1,369 @@
+# Tiled export of the interactive map (health sites, conflict events and
+# region aggregates) as a z/x/y directory of GeoJSON vector tiles.
+#
+# Points are binned into a grid of CLUSTER_CELLS x CLUSTER_CELLS cells per
+# tile below ``raw_zoom``: each occupied cell becomes one feature with the
+# number of points (and fatalities) it stands for, placed at their mean
+# position. From ``raw_zoom`` on every point is written as is. Region
+# polygons are clipped to each tile, using the boundary level of lod.py that
+# suits the tile resolution. All grouping is done with array operations per
+# zoom level, not per point.
+#
+# The output directory also gets metadata.json and a dependency-free
+# index.html viewer that fetches only the tiles in view, so the map can be
+# served offline (e.g. ``python -m http.server`` in the output directory).
+#
+#   python tiles.py OUT_DIR --health WHO.shp --acled ACLED.shp --regions Regions_with_Health_Events.shp
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from cache import OUTPUT_DIR
+from reproject import reproject
+
+
+TILE_DIR = os.path.join(OUTPUT_DIR, "map_tiles")
+TILE_PX = 256
+CLUSTER_CELLS = 32  # clustering grid per tile edge (8 px cells)
+MAX_LAT = 85.0511287798
+
+
+# ---- Web Mercator ----
+def mercator(lon, lat):
+    """Longitude/latitude to normalised Web Mercator coordinates in [0, 1)."""
+    lat = np.radians(np.clip(lat, -MAX_LAT, MAX_LAT))
+    mx = (np.asarray(lon, dtype="float64") + 180.0) / 360.0
+    my = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+    return mx, my
+
+
+def inverse_mercator(mx, my):
+    lon = np.asarray(mx) * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * np.asarray(my)))))
+    return lon, lat
+
+
+def tile_bounds(z, x, y):
+    """(west, south, east, north) of tile z/x/y in degrees."""
+    n = 2 ** z
+    west, north = inverse_mercator(x / n, y / n)
+    east, south = inverse_mercator((x + 1) / n, (y + 1) / n)
+    return float(west), float(south), float(east), float(north)
+
+
+def _lonlat(gdf):
+    if gdf.crs is not None:
+        gdf = reproject(gdf, "EPSG:4326")
+    geoms = gdf.geometry.to_numpy()
+    lon, lat = shapely.get_x(geoms), shapely.get_y(geoms)
+    keep = np.isfinite(lon) & np.isfinite(lat)
+    return gdf[keep], lon[keep], lat[keep]
+
+
+def _digits(z):
+    """Coordinate decimals that keep about a tenth of a pixel at zoom ``z``."""
+    return int(min(7, max(2, np.ceil(np.log10(TILE_PX * 2 ** z * 10 / 360.0)))))
+
+
+def _json_values(series):
+    """Column values as JSON-safe Python objects (numbers stay numbers, missing values become null)."""
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype(str).where(series.notna())
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _write_tile(out_dir, layer, z, x, y, features):
+    path = os.path.join(out_dir, layer, str(z), str(x))
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, f"{y}.json"), "w") as fh:
+        json.dump({"type": "FeatureCollection", "features": features}, fh, separators=(",", ":"))
+
+
+def _point_features(lon, lat, props, digits):
+    columns = list(props)
+    values = [props[c] for c in columns]
+    return [{"type": "Feature",
+             "geometry": {"type": "Point", "coordinates": [round(float(a), digits), round(float(b), digits)]},
+             "properties": {c: v[i] for c, v in zip(columns, values)}}
+            for i, (a, b) in enumerate(zip(lon, lat))]
+
+
+def _by_tile(tx, ty, n):
+    """Yield (x, y, row indices) for every occupied tile, from one sort of the tile keys."""
+    key = tx.astype(np.int64) * n + ty
+    order = np.argsort(key, kind="stable")
+    bounds = np.flatnonzero(np.diff(key[order])) + 1
+    for rows in np.split(order, bounds):
+        if len(rows):
+            yield int(tx[rows[0]]), int(ty[rows[0]]), rows
+
+
+# ---- Point layers ----
+def write_point_tiles(out_dir, layer, gdf, zooms, raw_zoom, columns=(), weight=None):
+    """Clustered tiles below ``raw_zoom`` and raw point tiles from it on; returns the tile count."""
+    gdf, lon, lat = _lonlat(gdf)
+    mx, my = mercator(lon, lat)
+    weights = (np.nan_to_num(pd.to_numeric(gdf[weight], errors="coerce").to_numpy(dtype="float64"))
+               if weight else None)
+    props = {c: _json_values(gdf[c]) for c in columns if c in gdf.columns}
+    written = 0
+    for z in zooms:
+        n = 2 ** z
+        digits = _digits(z)
+        if z >= raw_zoom:
+            tx, ty = np.minimum((mx * n).astype(np.int64), n - 1), np.minimum((my * n).astype(np.int64), n - 1)
+            for x, y, rows in _by_tile(tx, ty, n):
+                _write_tile(out_dir, layer, z, x, y, _point_features(
+                    lon[rows], lat[rows], {c: [v[i] for i in rows] for c, v in props.items()}, digits))
+                written += 1
+            continue
+
+        # One cluster per occupied grid cell: counts, weight sums and mean positions via bincount
+        cells = n * CLUSTER_CELLS
+        cx = np.minimum((mx * cells).astype(np.int64), cells - 1)
+        cy = np.minimum((my * cells).astype(np.int64), cells - 1)
+        cell_keys, inverse = np.unique(cx * cells + cy, return_inverse=True)
+        count = np.bincount(inverse)
+        cmx = np.bincount(inverse, weights=mx) / count
+        cmy = np.bincount(inverse, weights=my) / count
+        clon, clat = inverse_mercator(cmx, cmy)
+        cluster_props = {"count": count.tolist()}
+        if weights is not None:
+            cluster_props[weight] = np.bincount(inverse, weights=weights).round(2).tolist()
+        tx, ty = (cell_keys // cells) // CLUSTER_CELLS, (cell_keys % cells) // CLUSTER_CELLS
+        for x, y, rows in _by_tile(tx, ty, n):
+            _write_tile(out_dir, layer, z, x, y, _point_features(
+                clon[rows], clat[rows], {c: [v[i] for i in rows] for c, v in cluster_props.items()}, digits))
+            written += 1
+    return written
+
+
+# ---- Region layer ----
+def write_region_tiles(out_dir, layer, regions_path, zooms, columns=()):
+    """Region polygons clipped per tile, at the boundary level that suits each zoom; returns the tile count."""
+    from cache import read_layer
+    from lod import read_lod
+
+    full = read_layer(regions_path)
+    minx, miny, maxx, maxy = reproject(full, "EPSG:4326").total_bounds if full.crs else full.total_bounds
+    written = 0
+    for z in zooms:
+        n = 2 ** z
+        # Width of the layer in pixels at this zoom decides the simplification level
+        width_px = max(1, int((maxx - minx) / 360.0 * n * TILE_PX))
+        gdf = read_lod(regions_path, width_px=width_px)
+        if gdf.crs is not None:
+            gdf = reproject(gdf, "EPSG:4326")
+        geoms = gdf.geometry.to_numpy()
+        tree = shapely.STRtree(geoms)
+        values = {c: _json_values(gdf[c]) for c in columns if c in gdf.columns}
+        records = [dict(zip(values, row)) for row in zip(*values.values())] if values else [{}] * len(gdf)
+        digits = _digits(z)
+
+        # Tiles covering the layer extent (north-west to south-east corner)
+        x0, y0 = (min(n - 1, int(v * n)) for v in mercator(minx, maxy))
+        x1, y1 = (min(n - 1, int(v * n)) for v in mercator(maxx, miny))
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                west, south, east, north = tile_bounds(z, x, y)
+                hits = tree.query(shapely.box(west, south, east, north), predicate="intersects")
+                if not len(hits):
+                    continue
+                clipped = shapely.set_precision(shapely.clip_by_rect(geoms[hits], west, south, east, north),
+                                                10.0 ** -digits)
+                features = [{"type": "Feature", "geometry": json.loads(shapely.to_geojson(g)), "properties": records[i]}
+                            for g, i in zip(clipped, hits) if not shapely.is_empty(g)]
+                if features:
+                    _write_tile(out_dir, layer, z, x, y, features)
+                    written += 1
+    return written
+
+
+# ---- Export ----
+def export_tiles(out_dir=TILE_DIR, health_gdf=None, acled_gdf=None, regions_path=None,
+                 min_zoom=4, max_zoom=11, raw_zoom=10, region_max_zoom=9, verbose=True):
+    """Write the tile pyramid, metadata.json and the viewer to ``out_dir``.
+
+    Region tiles stop at ``region_max_zoom``; the viewer scales them up beyond it.
+    An earlier export in ``out_dir`` is replaced; any other non-empty
+    directory is refused rather than cleared.
+    """
+    if os.path.isdir(out_dir) and os.listdir(out_dir):
+        if not os.path.isfile(os.path.join(out_dir, "metadata.json")):
+            raise FileExistsError(f"{out_dir} is not empty and holds no earlier tile export (metadata.json); "
+                                  f"choose an empty or new directory")
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    zooms = range(min_zoom, max_zoom + 1)
+    layers, bounds = {}, []
+
+    if regions_path is not None:
+        start = time.perf_counter()
+        columns = ["admin1", "event_coun", "fatalities", "health_fac"]
+        tiles = write_region_tiles(out_dir, "regions", regions_path, range(min_zoom, min(max_zoom, region_max_zoom) + 1),
+                                   columns)
+        from cache import read_layer
+        regions = read_layer(regions_path)
+        layers["regions"] = {"type": "polygon", "max_zoom": min(max_zoom, region_max_zoom), "max": {c: float(regions[c].max()) for c in columns[1:]
+                                                          if c in regions.columns}}
+        bounds.append(reproject(regions, "EPSG:4326").total_bounds)
+        if verbose:
+            print(f"regions: {tiles} tiles in {time.perf_counter() - start:.2f} s")
+
+    for name, gdf, columns, weight in (("health_sites", health_gdf, ["facility_n", "facility_t"], None),
+                                       ("events", acled_gdf, ["event_date", "event_type", "fatalities"], "fatalities")):
+        if gdf is None:
+            continue
+        start = time.perf_counter()
+        tiles = write_point_tiles(out_dir, name, gdf, zooms, raw_zoom, columns, weight)
+        layers[name] = {"type": "point", "max_zoom": max_zoom, "count": int(len(gdf))}
+        bounds.append(reproject(gdf, "EPSG:4326").total_bounds if gdf.crs else gdf.total_bounds)
+        if verbose:
+            print(f"{name}: {len(gdf)} points, {tiles} tiles in {time.perf_counter() - start:.2f} s")
+
+    bounds = np.array(bounds)
+    metadata = {"min_zoom": min_zoom, "max_zoom": max_zoom, "raw_zoom": raw_zoom, "tile_size": TILE_PX,
+                "bounds": [float(bounds[:, 0].min()), float(bounds[:, 1].min()),
+                           float(bounds[:, 2].max()), float(bounds[:, 3].max())] if len(bounds) else None,
+                "layers": layers}
+    with open(os.path.join(out_dir, "metadata.json"), "w") as fh:
+        json.dump(metadata, fh, indent=1)
+    with open(os.path.join(out_dir, "index.html"), "w") as fh:
+        fh.write(VIEWER_HTML)
+    return metadata
+
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Health Facilities &amp; Conflict Events in Somalia</title>
+<style>
+  html, body { margin: 0; height: 100%; font-family: sans-serif; }
+  canvas { display: block; width: 100%; height: 100%; cursor: grab; background: #eef3f7; }
+  #legend { position: absolute; top: 10px; left: 10px; background: #fff; padding: 6px 10px; border-radius: 4px;
+            font-size: 13px; box-shadow: 0 1px 4px #0004; }
+</style>
+</head>
+<body>
+<canvas id="map"></canvas>
+<div id="legend"><b>Health Facilities &amp; Conflict Events</b><br>
+  <span style="color:#1f5fbf">&#9679;</span> Health facilities &nbsp;
+  <span style="color:#d62728">&#9679;</span> Conflict events (clusters sized by count)<br>
+  Regions shaded by number of conflict events</div>
+<script>
+// Minimal slippy map: loads only the z/x/y tiles in view (serve this folder over HTTP).
+const canvas = document.getElementById("map"), ctx = canvas.getContext("2d");
+const cache = new Map();
+let meta, zoom, cx, cy;  // zoom may be fractional; cx/cy: view centre in normalised Web Mercator
+
+function merc(lon, lat) {
+  const s = Math.sin(Math.max(-85.05, Math.min(85.05, lat)) * Math.PI / 180);
+  return [(lon + 180) / 360, 0.5 - Math.log((1 + s) / (1 - s)) / (4 * Math.PI)];
+}
+
+function tile(layer, z, x, y) {
+  const key = `${layer}/${z}/${x}/${y}`;
+  if (!cache.has(key)) {
+    cache.set(key, null);
+    fetch(`${key}.json`).then(r => r.ok ? r.json() : {features: []})
+      .then(data => { cache.set(key, data); draw(); }).catch(() => cache.set(key, {features: []}));
+  }
+  return cache.get(key);
+}
+
+function draw() {
+  const w = canvas.width = canvas.clientWidth, h = canvas.height = canvas.clientHeight;
+  const world = meta.tile_size * Math.pow(2, zoom);
+  const toPx = ([lon, lat]) => { const [mx, my] = merc(lon, lat); return [(mx - cx) * world + w / 2, (my - cy) * world + h / 2]; };
+  ctx.clearRect(0, 0, w, h);
+  for (const layer of ["regions", "health_sites", "events"]) {
+    const info = meta.layers[layer];
+    if (!info) continue;
+    // Past a layer's last zoom level its deepest tiles are drawn scaled up
+    const z = Math.max(meta.min_zoom, Math.min(info.max_zoom, Math.floor(zoom))), n = Math.pow(2, z);
+    const x0 = Math.floor((cx - w / 2 / world) * n), x1 = Math.floor((cx + w / 2 / world) * n);
+    const y0 = Math.floor((cy - h / 2 / world) * n), y1 = Math.floor((cy + h / 2 / world) * n);
+    const max = info.max ? info.max.event_coun || 1 : 1;
+    for (let x = Math.max(0, x0); x <= Math.min(n - 1, x1); x++) {
+      for (let y = Math.max(0, y0); y <= Math.min(n - 1, y1); y++) {
+        const data = tile(layer, z, x, y);
+        if (!data) continue;
+        for (const f of data.features) {
+          const g = f.geometry, p = f.properties;
+          if (layer === "regions") {
+            const polys = g.type === "Polygon" ? [g.coordinates] : g.type === "MultiPolygon" ? g.coordinates : [];
+            ctx.beginPath();
+            for (const poly of polys) for (const ring of poly) ring.forEach((c, i) => {
+              const [px, py] = toPx(c); i ? ctx.lineTo(px, py) : ctx.moveTo(px, py);
+            });
+            ctx.fillStyle = `rgba(214, 39, 40, ${0.1 + 0.6 * Math.sqrt((p.event_coun || 0) / max)})`;
+            ctx.fill("evenodd");
+          } else {
+            const [px, py] = toPx(g.coordinates), count = p.count || 1;
+            ctx.beginPath();
+            ctx.arc(px, py, Math.min(30, 2 + 1.5 * Math.sqrt(count)), 0, 2 * Math.PI);
+            ctx.fillStyle = layer === "events" ? "rgba(214, 39, 40, 0.6)" : "rgba(31, 95, 191, 0.8)";
+            ctx.fill();
+          }
+        }
+      }
+    }
+  }
+}
+
+let drag = null;
+canvas.addEventListener("mousedown", e => drag = [e.clientX, e.clientY]);
+window.addEventListener("mouseup", () => drag = null);
+window.addEventListener("mousemove", e => {
+  if (!drag) return;
+  const world = meta.tile_size * Math.pow(2, zoom);
+  cx -= (e.clientX - drag[0]) / world; cy -= (e.clientY - drag[1]) / world;
+  drag = [e.clientX, e.clientY]; draw();
+});
+canvas.addEventListener("wheel", e => {
+  e.preventDefault();
+  zoom = Math.max(meta.min_zoom, Math.min(meta.max_zoom + 2, zoom - Math.sign(e.deltaY) * 0.5));
+  draw();
+}, {passive: false});
+window.addEventListener("resize", draw);
+
+fetch("metadata.json").then(r => r.json()).then(m => {
+  meta = m;
+  const [west, south, east, north] = m.bounds, [ax, ay] = merc(west, north), [bx, by] = merc(east, south);
+  cx = (ax + bx) / 2; cy = (ay + by) / 2;
+  zoom = Math.max(m.min_zoom, Math.min(m.max_zoom, Math.log2(canvas.clientWidth / m.tile_size / (bx - ax))));
+  draw();
+});
+</script>
+</body>
+</html>
+"""
+
+
+if __name__ == "__main__":
+    from cache import read_layer
+
+    parser = argparse.ArgumentParser(description="Export the interactive map as z/x/y GeoJSON tiles with a viewer.")
+    parser.add_argument("out", nargs="?", default=TILE_DIR)
+    parser.add_argument("--health", help="WHO health sites layer")
+    parser.add_argument("--acled", help="ACLED events layer")
+    parser.add_argument("--regions", help="region layer with the aggregated columns (Somalia_Regions_with_Health_Events.shp)")
+    parser.add_argument("--min-zoom", type=int, default=4)
+    parser.add_argument("--max-zoom", type=int, default=11)
+    parser.add_argument("--raw-zoom", type=int, default=10, help="first zoom level without point clustering")
+    parser.add_argument("--region-max-zoom", type=int, default=9)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    export_tiles(args.out, read_layer(args.health) if args.health else None,
+                 read_layer(args.acled) if args.acled else None, args.regions,
+                 args.min_zoom, args.max_zoom, args.raw_zoom, args.region_max_zoom)
+    print(f"Tiles written to {args.out} in {time.perf_counter() - start:.2f} s")
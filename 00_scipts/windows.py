@@ -0,0 +1,222 @@
+# Region tables and facility exposure per year and per rolling multi-year window.
+#
+# The expensive shared inputs are prepared once in the parent process: the
+# events and facilities are joined to the regions (region codes from one
+# RegionIndex pass) and projected to the metric CRS. Those arrays are copied
+# into multiprocessing.shared_memory blocks, and every window (e.g. 2015,
+# 2014-2016, 2012-2016) is an independent job on a process pool: a worker
+# attaches to the blocks without copying or pickling any GeoDataFrame,
+# selects the window's events with a year mask and reduces them to per-region
+# event and fatality counts and to the number of facilities per region with
+# an event within each radius (accessibility.facility_exposure on the window's
+# events). Only the small per-region results travel back to the parent.
+#
+#   python windows.py ACLED.shp WHO_health_sites.shp REGIONS.shp [--widths 1 3 5] [--workers N] [--check]
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from accessibility import RADII_KM, facility_exposure, projected_xy
+from aggregate import bincount
+from cache import OUTPUT_DIR
+from instrument import span
+from streaming import _years
+
+
+WIDTHS = (1, 3, 5)  # window lengths in years
+WINDOWS_CSV = os.path.join(OUTPUT_DIR, "windows", "region_windows.csv")
+
+
+# ---- Shared memory ----
+class SharedArrays:
+    """Named NumPy arrays copied once into shared memory; ``specs`` lets other processes attach."""
+
+    def __init__(self, arrays):
+        self.blocks, self.specs = [], {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+_blocks = []  # keeps the attached blocks of a worker open
+_arrays = {}
+
+
+def attach(specs):
+    """Worker side: map the shared blocks described by ``specs`` as read-only arrays."""
+    _arrays.clear()
+    for name, (block_name, shape, dtype) in specs.items():
+        if sys.version_info >= (3, 13):
+            block = shared_memory.SharedMemory(name=block_name, track=False)
+        else:
+            block = shared_memory.SharedMemory(name=block_name)
+            if os.name == "posix" and multiprocessing.get_start_method() != "fork":
+                # A spawned worker has its own resource tracker, which would unlink the block when it exits
+                resource_tracker.unregister(block._name, "shared_memory")
+        _blocks.append(block)
+        array = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        _arrays[name] = array
+
+
+# ---- Windows ----
+def year_windows(first, last, widths=WIDTHS):
+    """Inclusive (start, end) year windows of every width that fit between ``first`` and ``last``."""
+    return [(start, start + width - 1) for width in widths for start in range(first, last - width + 2)]
+
+
+def _window_job(job):
+    """Per-region events, fatalities, facilities with an event within each radius, for one window."""
+    window, n_regions, radii_m = job
+    start, end = window
+    a = _arrays
+    events = np.flatnonzero((a["year"] >= start) & (a["year"] <= end))
+    codes = a["event_codes"][events]
+    counts, _, nearest = facility_exposure(a["facility_xy"], a["event_xy"][events], radii_m)
+
+    facility_codes = a["facility_codes"]
+    exposed = np.stack([bincount(facility_codes, n_regions, counts[:, i] > 0) for i in range(len(radii_m))], axis=1)
+    located = np.isfinite(nearest)
+    near_sum = bincount(facility_codes[located], n_regions, nearest[located])
+    near_n = bincount(facility_codes[located], n_regions)
+    return {
+        "window": window,
+        "events": bincount(codes, n_regions),
+        "fatalities": bincount(codes, n_regions, a["fatalities"][events]),
+        "exposed": exposed,
+        "nearest_km": np.divide(near_sum, near_n, out=np.full(n_regions, np.nan), where=near_n > 0) / 1000,
+    }
+
+
+def window_inputs(acled_gdf, health_gdf, region_index, event_xy=None, facility_xy=None):
+    """Arrays shared with the workers: region codes, metric coordinates, years and fatalities."""
+    fatalities = (np.nan_to_num(pd.to_numeric(acled_gdf["fatalities"], errors="coerce").to_numpy(dtype="float64"))
+                  if "fatalities" in acled_gdf.columns else np.zeros(len(acled_gdf)))
+    return {
+        "event_codes": np.asarray(region_index.assign(acled_gdf), dtype=np.int32),
+        "event_xy": projected_xy(acled_gdf) if event_xy is None else np.asarray(event_xy, dtype="float64"),
+        "year": _years(acled_gdf),
+        "fatalities": fatalities,
+        "facility_codes": np.asarray(region_index.assign(health_gdf), dtype=np.int32),
+        "facility_xy": projected_xy(health_gdf) if facility_xy is None else np.asarray(facility_xy, dtype="float64"),
+    }
+
+
+def window_table(acled_gdf, health_gdf, region_index, widths=WIDTHS, radii_km=RADII_KM, workers=None,
+                 event_xy=None, facility_xy=None, verbose=True):
+    """Long table: one row per (window, region) with events, fatalities, facilities and their exposure.
+
+    ``workers=1`` runs every window in this process; otherwise the windows
+    are spread over a process pool (all cores by default).
+    """
+    start_time = time.perf_counter()
+    arrays = window_inputs(acled_gdf, health_gdf, region_index, event_xy, facility_xy)
+    known = arrays["year"][arrays["year"] >= 0]
+    windows = year_windows(int(known.min()), int(known.max()), widths) if len(known) else []
+    n_regions = len(region_index)
+    radii_km = sorted(radii_km)
+    jobs = [(window, n_regions, [r * 1000 for r in radii_km]) for window in windows]
+
+    with span("time_windows", rows_in=len(arrays["year"]), windows=len(windows)) as s:
+        if workers == 1:
+            _arrays.clear()
+            _arrays.update(arrays)
+            results = [_window_job(job) for job in jobs]
+        else:
+            chunksize = max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1)))
+            with SharedArrays(arrays) as shared, ProcessPoolExecutor(max_workers=workers, initializer=attach,
+                                                                     initargs=(shared.specs,)) as pool:
+                results = list(pool.map(_window_job, jobs, chunksize=chunksize))
+        s.rows_out = len(results) * n_regions
+
+    health_fac = bincount(arrays["facility_codes"], n_regions)
+    frames = []
+    for result in results:
+        start, end = result["window"]
+        frame = pd.DataFrame({
+            "window": f"{start}" if start == end else f"{start}-{end}",
+            "start": start, "end": end, "years": end - start + 1,
+            "region": region_index.names,
+            "events": result["events"],
+            "fatalities": result["fatalities"],
+            "health_fac": health_fac,
+        })
+        for i, r in enumerate(radii_km):
+            frame[f"exp_{r:g}km"] = result["exposed"][:, i]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                frame[f"share_{r:g}km"] = result["exposed"][:, i] / health_fac
+        frame["nearest_km"] = result["nearest_km"]
+        frames.append(frame)
+
+    if verbose:
+        print(f"window_table: {len(windows)} windows x {n_regions} regions, {len(arrays['year'])} events, "
+              f"{len(arrays['facility_xy'])} facilities in {time.perf_counter() - start_time:.2f} s")
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _check(acled_gdf, health_gdf, region_index, table, radii_km):
+    """Recompute one multi-year window with a plain year filter, exposure_table and groupby."""
+    from accessibility import exposure_table
+
+    row = table.loc[table["years"].idxmax()]
+    start, end = int(row["start"]), int(row["end"])
+    subset = acled_gdf[(_years(acled_gdf) >= start) & (_years(acled_gdf) <= end)]
+    exposure = exposure_table(health_gdf, subset, radii_km)
+    exposure["region"] = region_index.labels(region_index.assign(health_gdf))
+    r = sorted(radii_km)[0]
+    expected = (exposure[f"ev_{r:g}km"] > 0).groupby(exposure["region"]).sum()
+    got = table[(table["start"] == start) & (table["end"] == end)].set_index("region")[f"exp_{r:g}km"]
+    events = pd.Series(region_index.labels(region_index.assign(subset))).value_counts()
+    got_events = table[(table["start"] == start) & (table["end"] == end)].set_index("region")["events"]
+    return (np.array_equal(got.reindex(expected.index).to_numpy(), expected.to_numpy())
+            and np.array_equal(got_events.reindex(events.index).to_numpy(), events.to_numpy()))
+
+
+if __name__ == "__main__":
+    from cache import read_layer
+    from regions import RegionIndex
+
+    parser = argparse.ArgumentParser(description="Region tables and facility exposure per year window.")
+    parser.add_argument("acled")
+    parser.add_argument("health")
+    parser.add_argument("regions")
+    parser.add_argument("--widths", type=int, nargs="+", default=list(WIDTHS), help="window lengths in years")
+    parser.add_argument("--radii", type=float, nargs="+", default=list(RADII_KM), help="radii in km")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores, 1: no pool)")
+    parser.add_argument("--name-col", default="admin1")
+    parser.add_argument("--out", default=WINDOWS_CSV)
+    parser.add_argument("--check", action="store_true", help="recompute the longest window without the engine")
+    args = parser.parse_args()
+
+    acled_gdf, health_gdf = read_layer(args.acled), read_layer(args.health)
+    region_index = RegionIndex(read_layer(args.regions), name_col=args.name_col)
+    table = window_table(acled_gdf, health_gdf, region_index, args.widths, args.radii, args.workers)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    table.to_csv(args.out, index=False)
+    print(f"Saved {len(table)} rows to {args.out}")
+    if args.check:
+        print("Matches the direct computation:", _check(acled_gdf, health_gdf, region_index, table, args.radii))
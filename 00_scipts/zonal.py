@@ -0,0 +1,279 @@
+# Zonal statistics of hazard rasters (drought index, flood extent) over the
+# regions or over buffers around the health facilities.
+#
+# A raster is never read whole: every zone reads only the window of cells
+# under its bounding box, in row strips of at most MAX_CELLS cells, and its
+# cell mask (cells whose centre lies inside the zone, one vectorized
+# contains_xy call) is built strip by strip as well, so memory stays bounded
+# by MAX_CELLS however large the zone or fine the raster. The zones are
+# reprojected and their windows computed once per raster grid; the masks of
+# zones that fit in one strip (e.g. facility buffers) are kept, up to
+# MASK_CACHE_CELLS cells, so further rasters on the same grid (e.g. one
+# drought raster per year) reuse them. Per zone the mean, the maximum and the
+# area of the cells at or above a hazard threshold are reduced from the masked
+# strips with NumPy.
+#
+# GeoTIFFs are read with rasterio (optional, as in hotspots.py); the .npy
+# surfaces written by hotspots.py are read memory-mapped without it.
+#
+#   python zonal.py ZONES.shp RASTER.tif [RASTER.tif ...] [--threshold 1] [--buffer-km 5] [--out OUT.csv] [--check]
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+from pyproj import CRS
+
+from hotspots import load_surface
+from instrument import span
+from reproject import METRIC_CRS, points_xy, reproject
+
+try:
+    import rasterio
+    from rasterio.windows import Window
+    HAS_RASTERIO = True
+except ImportError:
+    HAS_RASTERIO = False
+
+
+MAX_CELLS = 4_000_000  # cells per windowed read (and per mask strip)
+MASK_CACHE_CELLS = 64_000_000  # cells of single-strip zone masks kept per raster grid
+BUFFER_KM = 5
+EARTH_RADIUS_KM = 6371.0088
+
+
+# ---- Rasters ----
+class Raster:
+    """Single-band north-up raster read by window: a GeoTIFF (rasterio) or a hotspots.py .npy surface."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        stem, ext = os.path.splitext(path)
+        self._dataset = None
+        if ext.lower() in (".npy", ".json"):
+            self._array, grid = load_surface(stem)
+            self.transform = tuple(grid.transform)
+            self.width, self.height, self.crs, self.nodata = grid.width, grid.height, grid.crs, None
+        elif HAS_RASTERIO:
+            self._dataset = rasterio.open(path)
+            self.transform = tuple(self._dataset.transform.to_gdal())
+            self.width, self.height = self._dataset.width, self._dataset.height
+            self.crs, self.nodata = self._dataset.crs.to_wkt(), self._dataset.nodata
+        else:
+            raise ImportError(f"rasterio is needed to read {path} (pip install rasterio)")
+        if self.transform[2] != 0 or self.transform[4] != 0:
+            raise ValueError(f"{path}: rotated rasters are not supported")
+
+    @property
+    def grid_key(self):
+        """Rasters with the same key share zone windows and masks."""
+        return self.transform, self.width, self.height, CRS.from_user_input(self.crs).to_wkt()
+
+    def window(self, bounds):
+        """(row0, row1, col0, col1) of the cells under ``bounds``, clipped to the raster; None when off it."""
+        x0, dx, _, y0, _, dy = self.transform
+        minx, miny, maxx, maxy = bounds
+        col0 = max(int(np.floor((minx - x0) / dx)), 0)
+        col1 = min(int(np.ceil((maxx - x0) / dx)), self.width)
+        row0 = max(int(np.floor((maxy - y0) / dy)), 0)
+        row1 = min(int(np.ceil((miny - y0) / dy)), self.height)
+        return (row0, row1, col0, col1) if row0 < row1 and col0 < col1 else None
+
+    def centres(self, row0, row1, col0, col1):
+        """x (per column) and y (per row) of the cell centres of a window."""
+        x0, dx, _, y0, _, dy = self.transform
+        return x0 + (np.arange(col0, col1) + 0.5) * dx, y0 + (np.arange(row0, row1) + 0.5) * dy
+
+    def cell_area_km2(self, row0, row1):
+        """Area of one cell in each row of a window (varies with latitude on geographic rasters)."""
+        _, dx, _, y0, _, dy = self.transform
+        if not CRS.from_user_input(self.crs).is_geographic:
+            return np.full(row1 - row0, abs(dx * dy) / 1e6)
+        top = np.deg2rad(y0 + np.arange(row0, row1) * dy)
+        return EARTH_RADIUS_KM ** 2 * np.deg2rad(abs(dx)) * np.abs(np.sin(top) - np.sin(top + np.deg2rad(dy)))
+
+    def read(self, row0, row1, col0, col1):
+        """Cells of a window as float64, with nodata as NaN."""
+        if self._dataset is None:
+            block = np.array(self._array[row0:row1, col0:col1], dtype="float64")
+        else:
+            window = Window(col0, row0, col1 - col0, row1 - row0)
+            block = self._dataset.read(1, window=window).astype("float64")
+        if self.nodata is not None:
+            block[block == self.nodata] = np.nan
+        return block
+
+    def close(self):
+        if self._dataset is not None:
+            self._dataset.close()
+
+
+# ---- Zones ----
+def facility_buffers(health_gdf, radius_km=BUFFER_KM, facility_xy=None):
+    """Circular zones of ``radius_km`` around every facility, in METRIC_CRS."""
+    import geopandas as gpd
+
+    xy = np.column_stack(points_xy(health_gdf, METRIC_CRS)) if facility_xy is None else facility_xy
+    zones = shapely.buffer(shapely.points(xy), radius_km * 1000)
+    return gpd.GeoDataFrame(pd.DataFrame(health_gdf.drop(columns=health_gdf.geometry.name)), geometry=zones,
+                            crs=METRIC_CRS)
+
+
+class ZoneMasks:
+    """Per-zone raster windows, computed once per raster grid, and the cell masks of their row strips."""
+
+    def __init__(self, zones_gdf, cache_cells=MASK_CACHE_CELLS):
+        self.zones = zones_gdf
+        self.cache_cells = cache_cells
+        self._grids = {}
+
+    def __len__(self):
+        return len(self.zones)
+
+    def on(self, raster):
+        """List of (geometry, window) per zone on ``raster``'s grid (None for zones off the raster)."""
+        key = raster.grid_key
+        if key not in self._grids:
+            with span("zonal_windows", rows_in=len(self.zones), raster=raster.name) as s:
+                geoms = reproject(self.zones, raster.crs).geometry.to_numpy()
+                shapely.prepare(geoms)
+                zones = []
+                for geom in geoms:
+                    window = raster.window(geom.bounds) if geom is not None and not geom.is_empty else None
+                    zones.append((geom, window) if window is not None else None)
+                self._grids[key] = {"zones": zones, "masks": {}, "cached": 0}
+                s.rows_out = sum(zone is not None for zone in zones)
+        return self._grids[key]["zones"]
+
+    def strip(self, raster, i, start, stop):
+        """Mask of the cells of zone ``i`` in rows ``start:stop`` of its window."""
+        grid = self._grids[raster.grid_key]
+        geom, (row0, row1, col0, col1) = grid["zones"][i]
+        if i in grid["masks"]:
+            return grid["masks"][i][start - row0:stop - row0]
+        x, y = raster.centres(start, stop, col0, col1)
+        mask = shapely.contains_xy(geom, x[None, :], y[:, None])
+        if start == row0 and stop == row1 and grid["cached"] + mask.size <= self.cache_cells:
+            # The whole zone fits in one strip: keep its mask for the next raster on this grid
+            grid["masks"][i] = mask
+            grid["cached"] += mask.size
+        return mask
+
+
+# ---- Statistics ----
+def zonal_stats(raster, masks, threshold=None, max_cells=MAX_CELLS):
+    """Per zone: valid cells, mean, max and (with ``threshold``) the area in km² of cells >= threshold."""
+    n = len(masks)
+    cells = np.zeros(n, dtype=np.int64)
+    total = np.zeros(n)
+    peak = np.full(n, np.nan)
+    exposed = np.zeros(n)
+    with span("zonal_stats", rows_in=n, raster=raster.name) as s:
+        for i, zone in enumerate(masks.on(raster)):
+            if zone is None:
+                continue
+            _, (row0, row1, col0, col1) = zone
+            strip = max(1, max_cells // (col1 - col0))
+            for start in range(row0, row1, strip):
+                stop = min(start + strip, row1)
+                block = raster.read(start, stop, col0, col1)
+                inside = masks.strip(raster, i, start, stop) & ~np.isnan(block)
+                values = block[inside]
+                if values.size == 0:
+                    continue
+                cells[i] += values.size
+                total[i] += values.sum()
+                peak[i] = np.fmax(peak[i], values.max())
+                if threshold is not None:
+                    area = np.broadcast_to(raster.cell_area_km2(start, stop)[:, None], block.shape)
+                    exposed[i] += area[inside & (block >= threshold)].sum()
+        s.rows_out = int((cells > 0).sum())
+
+    table = pd.DataFrame({"cells": cells, "mean": np.divide(total, cells, out=np.full(n, np.nan), where=cells > 0),
+                          "max": peak})
+    if threshold is not None:
+        table["exp_km2"] = exposed
+    return table
+
+
+def zonal_table(zones_gdf, rasters, thresholds=None, max_cells=MAX_CELLS, verbose=True):
+    """Zone layer with ``<raster>_mean``, ``_max`` and ``_exp_km2`` columns for every raster path in ``rasters``.
+
+    ``thresholds`` maps a raster name (file name without extension) to its
+    hazard threshold; rasters without one get no exposed-area column.
+    """
+    thresholds = thresholds or {}
+    masks = ZoneMasks(zones_gdf)
+    table = zones_gdf.copy()
+    for path in rasters:
+        start = time.perf_counter()
+        raster = Raster(path)
+        try:
+            stats = zonal_stats(raster, masks, thresholds.get(raster.name), max_cells)
+        finally:
+            raster.close()
+        for column in stats.columns.drop("cells"):
+            table[f"{raster.name}_{column}"] = stats[column].to_numpy()
+        if verbose:
+            print(f"zonal_stats: {raster.name} ({raster.height} x {raster.width}) over {len(zones_gdf)} zones, "
+                  f"{int(stats['cells'].sum())} cells read in {time.perf_counter() - start:.2f} s")
+    return table
+
+
+def _check(path, zones_gdf, threshold, got):
+    """Recompute the statistics from the whole raster in memory (small rasters only)."""
+    raster = Raster(path)
+    full = raster.read(0, raster.height, 0, raster.width)
+    x, y = raster.centres(0, raster.height, 0, raster.width)
+    area = np.broadcast_to(raster.cell_area_km2(0, raster.height)[:, None], full.shape)
+    ok = True
+    for i, geom in enumerate(reproject(zones_gdf, raster.crs).geometry.to_numpy()):
+        inside = shapely.contains_xy(geom, x[None, :], y[:, None]) & ~np.isnan(full)
+        if not inside.any():
+            ok &= bool(np.isnan(got["mean"].iloc[i]))
+            continue
+        ok &= bool(np.isclose(full[inside].mean(), got["mean"].iloc[i])
+                   and np.isclose(full[inside].max(), got["max"].iloc[i]))
+        if threshold is not None:
+            ok &= bool(np.isclose(area[inside & (full >= threshold)].sum(), got["exp_km2"].iloc[i]))
+    raster.close()
+    return ok
+
+
+if __name__ == "__main__":
+    from cache import read_layer
+
+    parser = argparse.ArgumentParser(description="Zonal statistics of hazard rasters over regions or facility buffers.")
+    parser.add_argument("zones", help="region polygons, or facility points (buffered by --buffer-km)")
+    parser.add_argument("rasters", nargs="+", help="GeoTIFFs (rasterio) or hotspots.py .npy surfaces")
+    parser.add_argument("--threshold", type=float, nargs="+", default=None,
+                        help="hazard threshold per raster (one value for all) for the exposed area")
+    parser.add_argument("--buffer-km", type=float, default=BUFFER_KM)
+    parser.add_argument("--max-cells", type=int, default=MAX_CELLS, help="cells per windowed read")
+    parser.add_argument("--out", default=None, help="CSV to write")
+    parser.add_argument("--check", action="store_true", help="compare with whole-raster statistics")
+    args = parser.parse_args()
+
+    zones = read_layer(args.zones)
+    if np.all(shapely.get_type_id(zones.geometry.to_numpy()) == 0):
+        zones = facility_buffers(zones, args.buffer_km)
+    names = [os.path.splitext(os.path.basename(p))[0] for p in args.rasters]
+    values = args.threshold or []
+    thresholds = dict(zip(names, values if len(values) > 1 else values * len(names)))
+
+    table = zonal_table(zones, args.rasters, thresholds, args.max_cells)
+    print(pd.DataFrame(table.drop(columns=table.geometry.name)).describe().T)
+    if args.out:
+        pd.DataFrame(table.drop(columns=table.geometry.name)).to_csv(args.out, index=False)
+        print(f"Saved {len(table)} zones to {args.out}")
+    if args.check:
+        masks = ZoneMasks(zones)
+        for path, name in zip(args.rasters, names):
+            raster = Raster(path)
+            got = zonal_stats(raster, masks, thresholds.get(name), max_cells=1_000)
+            raster.close()
+            print(f"{name} matches the whole-raster computation:", _check(path, zones, thresholds.get(name), got))